@@ -0,0 +1,329 @@
+"""
+Offline performance checks for utilities.py.
+
+Usage:
+    python benchmarks.py import-time [--max-seconds 1.0]
+    python benchmarks.py run [--sizes 1000 10000 100000 1000000] [--save baseline.json] [--compare baseline.json]
+
+`run` times every utilities function on synthetic price series with a stubbed downloader, so no network access is needed.
+Every case is run inside utilities.profile_stages(), so the functions that report stages (download, simulate leverage, high
+detection, forward returns, melt, draw, ...) also get one record per stage. Results can be saved as a baseline and compared
+against later runs to flag regressions.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+LAZY_MODULES = ('yfinance', 'matplotlib', 'seaborn')  # Must not be imported by `import utilities`
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+SHILLER_PATH = os.path.join(REPO_DIR, 'ie_data.xls')  # Workbook used to time load_shiller_data()
+
+
+#########################################################################################################################################################
+def measure_import_time(module='utilities', repeats=5):
+    """
+    Measure how long `import utilities` takes in a fresh interpreter and which heavy dependencies it pulls in.
+
+    Parameters:
+        module (str): Module to import. Default is 'utilities'.
+        repeats (int): Number of fresh interpreters to time; the fastest run is reported. Default is 5.
+
+    Returns:
+        dict: 'seconds' (cumulative import time reported by python -X importtime) and 'lazy_modules_loaded'
+              (the LAZY_MODULES that were imported eagerly; should be empty).
+    """
+    code = f"import sys, json, {module}; print(json.dumps(sorted(m for m in {LAZY_MODULES!r} if m in sys.modules)))"
+    timings, loaded = [], []
+    for _ in range(repeats):
+        result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=REPO_DIR, capture_output=True, text=True, check=True)
+        loaded = json.loads(result.stdout.strip().splitlines()[-1])
+
+        # importtime lines look like "import time:  self [us] | cumulative | package"
+        for line in result.stderr.splitlines():
+            fields = [field.strip() for field in line.split('|')]
+            if len(fields) == 3 and fields[2] == module:
+                timings.append(int(fields[1]) / 1e6)
+
+    return {'seconds': min(timings), 'lazy_modules_loaded': loaded}
+
+
+def check_import_time(max_seconds):
+    """Print the import measurement and return a non-zero exit code if it regressed."""
+    measurement = measure_import_time()
+    print(f"import utilities: {measurement['seconds']:.3f}s (limit {max_seconds:.3f}s)")
+
+    failed = False
+    if measurement['lazy_modules_loaded']:
+        print(f"FAIL: imported eagerly: {', '.join(measurement['lazy_modules_loaded'])}")
+        failed = True
+    if measurement['seconds'] > max_seconds:
+        print("FAIL: import is slower than the limit")
+        failed = True
+    return 1 if failed else 0
+
+
+#########################################################################################################################################################
+def synthetic_bars(rows, seed=0):
+    """
+    Synthetic daily bars (geometric random walk) shaped like the yfinance output used by utilities.
+
+    Parameters:
+        rows (int): Number of bars.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: Bars indexed by Date with 'Open', 'High', 'Low', 'Close', 'Adj Close' and 'Volume' columns. Dates are one minute
+                      apart so a million rows still fit in the datetime64[ns] range.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.cumprod(1 + rng.normal(0.0003, 0.012, rows))
+    index = pd.date_range('2000-01-03', periods=rows, freq='min', name='Date')
+    return pd.DataFrame({'Open': prices, 'High': prices, 'Low': prices, 'Close': prices, 'Adj Close': prices, 'Volume': np.ones(rows)}, index=index)
+
+
+def stub_downloader(bars_by_ticker):
+    """Downloader stand-in for load_price_history() that serves synthetic bars instead of calling yfinance."""
+    def download(ticker, start=None):
+        bars = bars_by_ticker[ticker]
+        return (bars if start is None else bars[bars.index >= start]).copy()  # A fresh frame per call, like yfinance
+    return download
+
+
+def _measure(function, repeats):
+    """
+    Best wall time over repeats, then peak traced memory of one more call (tracemalloc would distort the timing).
+    Returns (seconds, peak MB, {(function, stage): (seconds, peak MB)}) with the stage times of the fastest run.
+    """
+    import utilities
+
+    seconds, stage_seconds = float('inf'), {}
+    for _ in range(repeats):
+        with utilities.profile_stages(trace_memory=False) as profiler:
+            start = time.perf_counter()
+            function()
+            elapsed = time.perf_counter() - start
+        if elapsed < seconds:
+            seconds, stage_seconds = elapsed, profiler.summary()['seconds'].to_dict()
+
+    tracemalloc.start()
+    memory_start = tracemalloc.get_traced_memory()[0]
+    with utilities.profile_stages() as profiler: # Uses the tracing started here
+        function()
+        # Stages reset the tracemalloc peak, so take the profiler's peak over the whole call
+        peak_mb = profiler.traced_peak_mb() - memory_start / 2**20
+    tracemalloc.stop()
+    stage_peaks = profiler.summary()['peak_mb'].to_dict()
+
+    stages = {stage: (stage_seconds[stage], stage_peaks.get(stage, float('nan'))) for stage in stage_seconds}
+    return seconds, peak_mb, stages
+
+
+def _benchmark_cases(rows, work_dir, max_plot_rows, max_loop_rows):
+    """(function, case, callable) for every utilities function at one data size."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import numpy as np
+    import pandas as pd
+    import utilities
+
+    tickers = ['AAA', 'BBB', 'CCC']
+    downloader = stub_downloader({ticker: synthetic_bars(rows, seed=i) for i, ticker in enumerate(tickers)})
+    bars = synthetic_bars(rows)
+    data = utilities.leverage_dataframe(pd.DataFrame({'Date': bars.index, 'Adj Close': bars['Adj Close'].to_numpy()}), 3)
+    ath_indices = utilities.find_ath_indices(data, 'Leveraged Price', 'ATH', window=30)
+    cache_dir = os.path.join(work_dir, 'prices')
+    image_path = os.path.join(work_dir, 'plot.png')
+
+    def cold_cache(call):
+        def run():
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            call()
+        return run
+
+    def uncached(call):
+        def run():
+            utilities.clear_returns_cache()
+            call()
+        return run
+
+    single = lambda: utilities.process_leveraged_data('AAA', 3, cache_dir=cache_dir, downloader=downloader)
+    multi = lambda: utilities.process_leveraged_data(tickers, [3, 3, 3], [.6, .2, .2], cache_dir=cache_dir, downloader=downloader)
+
+    cases = [
+        ('process_leveraged_data', 'single ticker, cold cache', cold_cache(single)),
+        ('process_leveraged_data', 'single ticker, warm cache', single),
+        ('process_leveraged_data', '3 tickers, cold cache', cold_cache(multi)),
+        ('process_leveraged_data', '3 tickers, warm cache', multi),
+        ('leverage_dataframe', '', lambda: utilities.leverage_dataframe(data[['Date', 'Adj Close']].copy(), 3)),
+    ]
+    for high_type in ['ATH', '52W']:
+        for window in [0, 30]:
+            cases.append(('find_ath_indices', f'{high_type}, window={window}', lambda h=high_type, w=window: utilities.find_ath_indices(data, 'Leveraged Price', h, w)))
+    cases += [
+        ('forward_returns_matrix', '', lambda: utilities.forward_returns_matrix(data, 'Leveraged Price', utilities.DEFAULT_HOLDING_PERIODS)),
+        ('calculate_ath_returns_all_periods', '', lambda: utilities.calculate_ath_returns_all_periods(data, ath_indices, 'Leveraged Price', utilities.DEFAULT_HOLDING_PERIODS)),
+        ('calculate_non_ath_returns_all_periods', '', lambda: utilities.calculate_non_ath_returns_all_periods(data, ath_indices, 'Leveraged Price', utilities.DEFAULT_HOLDING_PERIODS)),
+        ('compute_returns', '6 windows, uncached', uncached(lambda: utilities.compute_returns(data, [0, 5, 15, 30, 50, 75], 'Leveraged Price'))),
+        ('drawdown_profile', '', lambda: utilities.drawdown_profile(data, ['Adj Close', 'Leveraged Price'])),
+        ('returns_by_drawdown', '', lambda: utilities.returns_by_drawdown(data, 'Leveraged Price')),
+        ('leverage_sweep', '13 levels, with costs', lambda: utilities.leverage_sweep(data, [1 + 0.25 * i for i in range(13)], expense_ratio=.0091, borrowing_cost=.05)),
+        ('compute_returns', '6 windows, memoized', lambda: utilities.compute_returns(data, [0, 5, 15, 30, 50, 75], 'Leveraged Price')),
+        ('portfolio_grid_search', '10 candidates, warm cache',
+         lambda: utilities.portfolio_grid_search(tickers, np.array([[w, (1 - w) / 2, (1 - w) / 2] for w in np.linspace(0, 1, 10)]), 3,
+                                                 cache_dir=cache_dir, downloader=downloader)),
+        ('bootstrap_ath_analysis', '16 paths', lambda: utilities.bootstrap_ath_analysis(data, 16, leverage_scalar=3, seed=0, chunk_size=8)),
+    ]
+
+    # ATHTracker steps through bars in Python, so the full-history build is only timed up to max_loop_rows
+    if rows <= max_loop_rows:
+        tracker = utilities.ATHTracker.from_history(data.iloc[:-5], leverage_scalar=3)
+        state = tracker.to_dict()
+        cases += [
+            ('ATHTracker.update', 'full history', lambda: utilities.ATHTracker(3).update(data['Date'], data['Adj Close'])),
+            ('ATHTracker.update', '5 new bars', lambda: utilities.ATHTracker.from_dict(state).update(data['Date'].iloc[-5:], data['Adj Close'].iloc[-5:])),
+        ]
+
+    # Rendering every return with seaborn grows with history length, so only do it up to max_plot_rows
+    plot = lambda summary, relative: utilities.plot_returns(data, [0, 5, 15, 30, 50, 75], 'Leveraged Price', plot_relative=relative,
+                                                             summary=summary, save_path=image_path)
+    if rows <= max_plot_rows:
+        cases.append(('plot_returns', 'seaborn', uncached(lambda: plot(False, False))))
+        cases.append(('plot_returns', 'seaborn, plot_relative', uncached(lambda: plot(False, True))))
+    cases.append(('plot_returns', 'summary', uncached(lambda: plot(True, False))))
+    cases.append(('plot_returns', 'summary, plot_relative', uncached(lambda: plot(True, True))))
+    return cases
+
+
+def _shiller_cases(work_dir, path=SHILLER_PATH):
+    """(function, case, callable) for load_shiller_data() on the repo's workbook (its size is fixed, so it runs once)."""
+    import utilities
+
+    cache_dir = os.path.join(work_dir, 'shiller')
+    cached = lambda: utilities.load_shiller_data(path, cache_dir=cache_dir)
+
+    def cold():
+        shutil.rmtree(cache_dir, ignore_errors=True)
+        cached()
+
+    return [('load_shiller_data', 'parse workbook', cold), ('load_shiller_data', 'cached', cached)]
+
+
+def run_benchmarks(sizes=DEFAULT_SIZES, repeats=1, max_plot_rows=100_000, max_loop_rows=100_000, only=None):
+    """
+    Time every utilities function at each data size, with a per-stage breakdown for the functions that report stages.
+
+    Parameters:
+        sizes (list of int): Number of rows of the synthetic price series. Default is 1k, 10k, 100k and 1M.
+        repeats (int): Timed runs per case; the fastest is reported. Default is 1.
+        max_plot_rows (int): Largest size at which plot_returns is also timed with seaborn (summary mode always runs).
+        max_loop_rows (int): Largest size at which ATHTracker is fed the full history (it steps through bars in Python).
+        only (list of str or None): Only run the cases of these functions.
+
+    Returns:
+        list of dict: One record per (function, case, stage, rows) with 'seconds' and 'peak_mb'. The record with stage '' is the
+                      whole case; the others are its stages as reported by utilities.profile_stages() (e.g., 'compute_returns: high detection').
+    """
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='ath_benchmarks_')
+
+    def record(function, case, stage, rows, seconds, peak_mb):
+        results.append({'function': function, 'case': case, 'stage': stage, 'rows': rows, 'seconds': seconds, 'peak_mb': peak_mb})
+        name = f"  {stage}" if stage else f"{function} [{case}]" if case else function
+        print(f"{name:<70} {rows:>9,} rows  {seconds:>9.4f}s  {peak_mb:>9.1f} MB")
+
+    try:
+        runs = [(rows, _benchmark_cases(rows, work_dir, max_plot_rows, max_loop_rows)) for rows in sizes]
+        if os.path.exists(SHILLER_PATH) and (not only or 'load_shiller_data' in only):
+            import utilities
+            runs.append((len(utilities.load_shiller_data(SHILLER_PATH, cache_dir=None)), _shiller_cases(work_dir)))
+
+        for rows, cases in runs:
+            for function, case, call in cases:
+                if only and function not in only:
+                    continue
+                with contextlib.redirect_stdout(io.StringIO()):  # Silence the "Downloading data for ..." messages
+                    seconds, peak_mb, stages = _measure(call, repeats)
+                record(function, case, '', rows, seconds, peak_mb)
+                for (stage_function, stage), (stage_seconds, stage_peak) in stages.items():
+                    record(function, case, f'{stage_function}: {stage}', rows, stage_seconds, stage_peak)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def compare_results(results, baseline, threshold=1.25, min_seconds=0.005):
+    """
+    Flag cases that got slower or use more memory than a saved baseline.
+
+    Parameters:
+        results (list of dict): Output of run_benchmarks().
+        baseline (list of dict): A previously saved run_benchmarks() output.
+        threshold (float): Ratio over the baseline that counts as a regression. Default is 1.25 (25% worse).
+        min_seconds (float): Ignore timing changes on cases faster than this (timer noise). Default is 5 ms.
+
+    Returns:
+        list of str: One message per regression.
+    """
+    key = lambda record: (record['function'], record.get('case', ''), record.get('stage', ''), record['rows'])
+    baseline = {key(record): record for record in baseline}
+    regressions = []
+    for record in results:
+        previous = baseline.get(key(record))
+        if previous is None:
+            continue
+        name = f"{record['function']} [{record['case']}{' / ' + record['stage'] if record['stage'] else ''}] @ {record['rows']:,} rows"
+        if record['seconds'] > max(previous['seconds'], min_seconds) * threshold:
+            regressions.append(f"{name}: {previous['seconds']:.4f}s -> {record['seconds']:.4f}s")
+        if record['peak_mb'] > max(previous['peak_mb'], 1.0) * threshold: # NaN (no memory traced) never flags
+            regressions.append(f"{name}: {previous['peak_mb']:.1f} MB -> {record['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline performance checks for utilities.py.")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    import_time = commands.add_parser('import-time', help="Check that `import utilities` stays light (NumPy/pandas only).")
+    import_time.add_argument('--max-seconds', type=float, default=1.0, help="Fail if the import takes longer than this. Default is 1.0.")
+
+    run = commands.add_parser('run', help="Time every utilities function on synthetic data of increasing size.")
+    run.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help="Rows of synthetic data. Default is 1k 10k 100k 1M.")
+    run.add_argument('--repeats', type=int, default=1, help="Timed runs per case (fastest is kept). Default is 1.")
+    run.add_argument('--max-plot-rows', type=int, default=100_000, help="Largest size at which seaborn plotting is timed. Default is 100k.")
+    run.add_argument('--max-loop-rows', type=int, default=100_000, help="Largest size at which ATHTracker replays the full history. Default is 100k.")
+    run.add_argument('--only', nargs='+', default=None, help="Only benchmark these functions.")
+    run.add_argument('--save', default=None, help="Write the results to this JSON file (e.g., as a new baseline).")
+    run.add_argument('--compare', default=None, help="Compare against a baseline JSON file and fail on regressions.")
+    run.add_argument('--threshold', type=float, default=1.25, help="Slowdown/memory ratio that counts as a regression. Default is 1.25.")
+
+    args = parser.parse_args(argv)
+    if args.command == 'import-time':
+        return check_import_time(args.max_seconds)
+
+    results = run_benchmarks(args.sizes, args.repeats, args.max_plot_rows, args.max_loop_rows, args.only)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare_results(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,202 @@
+"""
+Headless renderer for the example charts (e.g., the PNGs in example-images/).
+
+Reads a JSON spec of scenarios, refreshes the local price cache once, and renders every scenario whose inputs or
+cached data changed since the last run to a PNG with the Agg backend in a pool of worker processes.
+
+Usage:
+    python render_reports.py example-images/report_specs.json --output-dir example-images --workers 4
+
+Each scenario in the spec is a dict with:
+    name (str): Output file name without extension (e.g., "3X-SPY-ATH").
+    tickers (str or list of str): A single ticker, or a list of tickers for a portfolio. Not needed when data_file is given.
+    data_file (str): Path to a Shiller workbook (see utilities.load_shiller_data) to use instead of tickers.
+    leverage (float or list of float): Leverage scalar(s). Default is 1.
+    weights (list of float): Portfolio weights (portfolios only).
+    high_type (str): "ATH" or "52W". Default is "ATH".
+    windows (list of int): Window sizes in rows (days for tickers, months for data_file scenarios). Default is [0, 5, 15, 30, 50, 75].
+    holding_periods (dict): Holding period labels mapped to days. Default is plot_returns' default.
+    plot_relative (bool): Plot leveraged and unleveraged side by side. Default is false.
+    price_column (str): Price column to analyze. Default depends on the data source.
+    summary (bool): Render from precomputed box statistics (see plot_returns). Default is false.
+"""
+import os
+os.environ.setdefault('MPLBACKEND', 'Agg')  # Inherited by the worker processes, so no window is ever opened
+
+import argparse
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import matplotlib
+matplotlib.use('Agg')
+
+import utilities
+
+MANIFEST_NAME = '.render_manifest.json'  # Fingerprints of the last rendered scenarios, stored in the output directory
+
+
+#########################################################################################################################################################
+def _scenario_tickers(scenario):
+    """List of tickers used by a scenario (empty for data_file scenarios)."""
+    if 'data_file' in scenario:
+        return []
+    tickers = scenario['tickers']
+    return tickers if isinstance(tickers, list) else [tickers]
+
+
+def _file_state(path):
+    """(mtime, size) of a file, or None if it does not exist."""
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def scenario_fingerprint(scenario, cache_dir):
+    """
+    Hash of everything a chart depends on: the scenario itself, the cached price data (or data file) it reads, and utilities.py.
+
+    Parameters:
+        scenario (dict): One scenario from the spec.
+        cache_dir (str): Directory of the local price cache.
+
+    Returns:
+        str: Hex digest that changes whenever the chart would change.
+    """
+    inputs = {
+        'scenario': scenario,
+        'data': [_file_state(utilities._price_cache_path(ticker, cache_dir)) for ticker in _scenario_tickers(scenario)],
+        'data_file': _file_state(scenario['data_file']) if 'data_file' in scenario else None,
+        'code': _file_state(utilities.__file__),
+    }
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+
+def render_scenario(scenario, output_path, cache_dir):
+    """
+    Build a scenario's data from the local cache and render its chart to output_path (runs inside a worker process).
+
+    Parameters:
+        scenario (dict): One scenario from the spec.
+        output_path (str): PNG file to write.
+        cache_dir (str): Directory of the local price cache.
+
+    Returns:
+        str: The scenario name.
+    """
+    leverage = scenario.get('leverage', 1)
+
+    if 'data_file' in scenario:
+        data = utilities.leverage_dataframe(utilities.load_shiller_data(scenario['data_file'], cache_dir=cache_dir), leverage)
+        default_column = 'Leveraged Price'
+    elif isinstance(scenario['tickers'], list):
+        data = utilities.process_leveraged_data(scenario['tickers'], leverage, scenario['weights'], cache_dir=cache_dir, offline=True)
+        default_column = 'TotalPortfolioPrice'
+    else:
+        data = utilities.process_leveraged_data(scenario['tickers'], leverage, cache_dir=cache_dir, offline=True)
+        default_column = 'Simulated Leveraged Price'
+
+    kwargs = {'save_path': output_path}
+    if 'holding_periods' in scenario:
+        kwargs['holding_periods'] = scenario['holding_periods']
+
+    utilities.plot_returns(
+        data,
+        windows=scenario.get('windows', [0, 5, 15, 30, 50, 75]),
+        price_column=scenario.get('price_column', default_column),
+        high_type=scenario.get('high_type', 'ATH'),
+        plot_relative=scenario.get('plot_relative', False),
+        summary=scenario.get('summary', False),
+        **kwargs
+    )
+    return scenario['name']
+
+
+#########################################################################################################################################################
+def render_reports(scenarios, output_dir, cache_dir=utilities.PRICE_CACHE_DIR, workers=None, offline=False, force=False):
+    """
+    Render every scenario whose inputs changed since the last run.
+
+    Parameters:
+        scenarios (list of dict): Scenarios to render (see the module docstring).
+        output_dir (str): Directory the PNGs and the render manifest are written to.
+        cache_dir (str): Directory of the local price cache.
+        workers (int or None): Number of worker processes. Default uses every CPU.
+        offline (bool): If True, do not refresh the price cache before rendering.
+        force (bool): If True, render every scenario even if it is unchanged.
+
+    Returns:
+        dict: Lists of 'rendered', 'skipped' and 'failed' scenario names.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    # Refresh every ticker (and parse every data file) once up front so the workers only read caches
+    if not offline:
+        for ticker in sorted({ticker for scenario in scenarios for ticker in _scenario_tickers(scenario)}):
+            utilities.load_price_history(ticker, cache_dir=cache_dir)
+    for data_file in sorted({scenario['data_file'] for scenario in scenarios if 'data_file' in scenario}):
+        utilities.load_shiller_data(data_file, cache_dir=cache_dir)
+
+    # Only render scenarios whose fingerprint changed (or whose image is missing)
+    report = {'rendered': [], 'skipped': [], 'failed': []}
+    pending = {}
+    for scenario in scenarios:
+        output_path = os.path.join(output_dir, f"{scenario['name']}.png")
+        fingerprint = scenario_fingerprint(scenario, cache_dir)
+        if not force and manifest.get(scenario['name']) == fingerprint and os.path.exists(output_path):
+            report['skipped'].append(scenario['name'])
+        else:
+            pending[scenario['name']] = (scenario, output_path, fingerprint)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(render_scenario, scenario, output_path, cache_dir): name
+                       for name, (scenario, output_path, fingerprint) in pending.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                except Exception as error:
+                    print(f"Failed to render {name}: {error}")
+                    report['failed'].append(name)
+                    continue
+                manifest[name] = pending[name][2]
+                report['rendered'].append(name)
+                print(f"Rendered {name}")
+
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render the forward-return charts described in a JSON spec.")
+    parser.add_argument('spec', help="JSON file with a list of scenarios (or an object with a 'scenarios' list).")
+    parser.add_argument('--output-dir', default='example-images', help="Directory to write the PNGs to. Default is example-images.")
+    parser.add_argument('--cache-dir', default=utilities.PRICE_CACHE_DIR, help="Directory of the local price cache.")
+    parser.add_argument('--workers', type=int, default=None, help="Number of worker processes. Default uses every CPU.")
+    parser.add_argument('--offline', action='store_true', help="Do not refresh the price cache before rendering.")
+    parser.add_argument('--force', action='store_true', help="Render every scenario even if it is unchanged.")
+    parser.add_argument('--only', nargs='+', default=None, help="Only consider the scenarios with these names.")
+    args = parser.parse_args(argv)
+
+    with open(args.spec) as f:
+        spec = json.load(f)
+    scenarios = spec['scenarios'] if isinstance(spec, dict) else spec
+    if args.only:
+        scenarios = [scenario for scenario in scenarios if scenario['name'] in args.only]
+
+    report = render_reports(scenarios, args.output_dir, cache_dir=args.cache_dir, workers=args.workers, offline=args.offline, force=args.force)
+    print(f"{len(report['rendered'])} rendered, {len(report['skipped'])} unchanged, {len(report['failed'])} failed.")
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
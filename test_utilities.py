@@ -0,0 +1,354 @@
+"""
+Offline tests for utilities.py. Prices come from a local stand-in for the yfinance downloader, so no network is needed.
+
+Usage:
+    python -m pytest -q
+"""
+import json
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import utilities
+
+
+def make_bars(rows, seed=0, start='2000-01-03'):
+    """Synthetic daily bars shaped like the yfinance output."""
+    rng = np.random.default_rng(seed)
+    prices = 100 * np.cumprod(1 + rng.normal(0.0003, 0.012, rows))
+    index = pd.bdate_range(start, periods=rows, name='Date')
+    return pd.DataFrame({'Open': prices, 'High': prices, 'Low': prices, 'Close': prices, 'Adj Close': prices, 'Volume': np.ones(rows)}, index=index)
+
+
+class StubDownloader:
+    """Serves fixed bars per ticker and records every (ticker, start) it is called with."""
+
+    def __init__(self, bars_by_ticker):
+        self.bars_by_ticker = bars_by_ticker
+        self.calls = []
+
+    def __call__(self, ticker, start=None):
+        self.calls.append((ticker, start))
+        bars = self.bars_by_ticker[ticker]
+        return (bars if start is None else bars[bars.index >= start]).copy()
+
+
+#########################################################################################################################################################
+def test_load_price_history_cold_download(tmp_path):
+    bars = make_bars(300)
+    downloader = StubDownloader({'SPY': bars})
+
+    loaded = utilities.load_price_history('SPY', cache_dir=str(tmp_path), downloader=downloader)
+
+    assert downloader.calls == [('SPY', None)]
+    assert (tmp_path / 'SPY.npz').exists()
+    pd.testing.assert_frame_equal(loaded, bars, check_freq=False, check_index_type=False)
+
+
+def test_load_price_history_incremental_append(tmp_path):
+    bars = make_bars(300)
+    utilities.load_price_history('SPY', cache_dir=str(tmp_path), downloader=StubDownloader({'SPY': bars.iloc[:250]}))
+
+    downloader = StubDownloader({'SPY': bars})
+    loaded = utilities.load_price_history('SPY', cache_dir=str(tmp_path), downloader=downloader)
+
+    assert downloader.calls == [('SPY', bars.index[249])]  # Re-fetches from the last cached bar
+    pd.testing.assert_frame_equal(loaded, bars, check_freq=False, check_index_type=False)
+
+
+def test_load_price_history_redownloads_after_adjustment(tmp_path):
+    bars = make_bars(300)
+    utilities.load_price_history('SPY', cache_dir=str(tmp_path), downloader=StubDownloader({'SPY': bars.iloc[:250]}))
+
+    # A 2:1 split after the last cached bar rewrites the whole adjusted history
+    adjusted = bars.copy()
+    adjusted.loc[adjusted.index[:260], ['Open', 'High', 'Low', 'Close', 'Adj Close']] /= 2
+    downloader = StubDownloader({'SPY': adjusted})
+    loaded = utilities.load_price_history('SPY', cache_dir=str(tmp_path), downloader=downloader)
+
+    assert downloader.calls == [('SPY', bars.index[249]), ('SPY', None)]
+    pd.testing.assert_frame_equal(loaded, adjusted, check_freq=False, check_index_type=False)
+
+
+def test_load_price_history_offline_hit(tmp_path):
+    bars = make_bars(300)
+    utilities.load_price_history('SPY', cache_dir=str(tmp_path), downloader=StubDownloader({'SPY': bars}))
+
+    downloader = StubDownloader({'SPY': bars})
+    loaded = utilities.load_price_history('SPY', cache_dir=str(tmp_path), offline=True, downloader=downloader)
+
+    assert downloader.calls == []
+    pd.testing.assert_frame_equal(loaded, bars, check_freq=False, check_index_type=False)
+
+
+def test_load_price_history_offline_miss(tmp_path):
+    downloader = StubDownloader({'SPY': make_bars(300)})
+
+    with pytest.raises(FileNotFoundError):
+        utilities.load_price_history('SPY', cache_dir=str(tmp_path), offline=True, downloader=downloader)
+    assert downloader.calls == []
+
+
+#########################################################################################################################################################
+def merge_process_leveraged_data(bars_by_ticker, tickers, leverage_scalars, portfolio_weights):
+    """The original per-ticker merge chain of process_leveraged_data(), kept as the reference for the matrix version."""
+    start_date = max(bars.index.min() for bars in bars_by_ticker.values())
+    result_df = pd.DataFrame()
+    for ticker, scalar, weight in zip(tickers, leverage_scalars, portfolio_weights):
+        baseline_data = bars_by_ticker[ticker]
+        baseline_data = baseline_data[baseline_data.index >= start_date].copy()
+        baseline_data['Daily Return'] = baseline_data['Adj Close'].pct_change()
+        baseline_data['Leveraged Return'] = baseline_data['Daily Return'] * scalar
+        baseline_data.loc[baseline_data.index[0], 'Leveraged Return'] = 0
+        baseline_data['Weighted Leveraged Return'] = baseline_data['Leveraged Return'] * weight
+        baseline_data['Simulated Leveraged Price'] = (1 + baseline_data['Weighted Leveraged Return']).cumprod()
+        baseline_data['Simulated Leveraged Price'] *= baseline_data['Adj Close'].iloc[0]
+        baseline_data = baseline_data.rename(columns={'Daily Return': f'DailyReturn_{ticker}',
+                                                      'Adj Close': f'AdjClose_{ticker}',
+                                                      'Leveraged Return': f'LeveragedReturn_{ticker}_{scalar}X',
+                                                      'Simulated Leveraged Price': f'SimulatedLeveragedPrice_{ticker}_{scalar}X',
+                                                      'Weighted Leveraged Return': f'WeightedLeveragedReturn_{ticker}_{scalar}X'})
+        baseline_data = baseline_data[[f'DailyReturn_{ticker}', f'AdjClose_{ticker}', f'LeveragedReturn_{ticker}_{scalar}X',
+                                       f'SimulatedLeveragedPrice_{ticker}_{scalar}X', f'WeightedLeveragedReturn_{ticker}_{scalar}X']]
+        baseline_data = baseline_data.reset_index()
+        result_df = baseline_data if result_df.empty else pd.merge(result_df, baseline_data, on='Date', how='outer')
+
+    adjusted_close_columns = [col for col in result_df.columns if col.startswith('AdjClose')]
+    result_df['UnleveragedPortfolioPrice'] = sum(result_df[col] * weight for col, weight in zip(adjusted_close_columns, portfolio_weights))
+    result_df['TotalPortfolioReturn'] = result_df[[col for col in result_df.columns if col.startswith('LeveragedReturn')]].sum(axis=1)
+    result_df['TotalPortfolioPrice'] = result_df[[col for col in result_df.columns if col.startswith('SimulatedLeveragedPrice')]].sum(axis=1)
+    return result_df.dropna().reset_index(drop=True)
+
+
+def test_process_leveraged_data_multi_ticker_matches_merge():
+    bars_by_ticker = {'QQQ': make_bars(800, seed=1, start='2000-01-03'),
+                      'SPY': make_bars(700, seed=2, start='2000-03-01'),  # Starts later, so it sets the first date
+                      'TLT': make_bars(900, seed=8, start='1999-10-01')}
+    gap = bars_by_ticker['QQQ'].index[300:305]
+    bars_by_ticker['QQQ'] = bars_by_ticker['QQQ'].drop(gap)  # Dropped bars in one ticker
+    tickers, leverage_scalars, portfolio_weights = ['QQQ', 'SPY', 'TLT'], [3, 1, 2], [.5, .3, .2]
+
+    portfolio_data = utilities.process_leveraged_data(tickers, leverage_scalars, portfolio_weights, cache_dir=None,
+                                                      downloader=StubDownloader(bars_by_ticker))
+
+    expected = merge_process_leveraged_data(bars_by_ticker, tickers, leverage_scalars, portfolio_weights)
+    assert portfolio_data['Date'].iloc[0] == bars_by_ticker['SPY'].index[1]  # First row with a return for every ticker
+    assert not portfolio_data['Date'].isin(gap).any()
+    pd.testing.assert_frame_equal(portfolio_data, expected, check_dtype=False)
+
+
+#########################################################################################################################################################
+def loop_find_ath_indices(data, price_column, high_type="ATH", window=0):
+    """The original row-by-row find_ath_indices(), kept as the reference for the vectorized version."""
+    ath_indices = []
+    if high_type == "ATH":
+        current_ath = -9999
+        for idx, value in data[price_column].items():
+            if value > current_ath:
+                current_ath = value
+                ath_indices.append(idx)
+    else:
+        for idx in data.index:
+            start_idx = max(0, idx - 365)
+            if data[price_column].iloc[idx] >= data[price_column].iloc[start_idx:idx + 1].max():
+                ath_indices.append(idx)
+
+    if window > 0:
+        expanded_indices = set()
+        for idx in ath_indices:
+            for offset in range(-window, window + 1):
+                if 0 <= idx + offset < len(data):
+                    expanded_indices.add(idx + offset)
+        ath_indices = sorted(expanded_indices)
+    return ath_indices
+
+
+@pytest.mark.parametrize('high_type', ["ATH", "52W"])
+@pytest.mark.parametrize('window', [0, 1, 5, 30])
+def test_find_ath_indices_matches_loop(high_type, window):
+    bars = make_bars(1500, seed=3)
+    data = utilities.leverage_dataframe(pd.DataFrame({'Date': bars.index, 'Adj Close': bars['Adj Close'].to_numpy()}), 3)
+
+    for column in ['Adj Close', 'Leveraged Price']:
+        assert utilities.find_ath_indices(data, column, high_type, window) == loop_find_ath_indices(data, column, high_type, window)
+
+
+@pytest.mark.parametrize('high_type', ["ATH", "52W"])
+def test_find_ath_indices_empty_frame(high_type):
+    data = pd.DataFrame({'Date': pd.DatetimeIndex([]), 'Adj Close': np.array([], dtype='float64')})
+
+    assert utilities.find_ath_indices(data, 'Adj Close', high_type, window=5) == []
+
+
+#########################################################################################################################################################
+def test_ath_tracker_round_trip_matches_batch():
+    bars = make_bars(1200, seed=15) # Sets new ATH and 52W highs after the saved prefix
+    data = pd.DataFrame({'Date': bars.index, 'Adj Close': bars['Adj Close'].to_numpy()})
+    holding_periods = {'Return_3M': 91, 'Return_12M': 365}
+    leveraged = utilities.leverage_dataframe(data.copy(), 3)
+    ath_mask = utilities.find_ath_mask(leveraged, 'Leveraged Price', "ATH")
+    high_mask = utilities.find_ath_mask(leveraged, 'Leveraged Price', "52W")
+    forward_returns = utilities.forward_returns_matrix(leveraged, 'Leveraged Price', holding_periods)
+
+    tracker = utilities.ATHTracker.from_history(data.iloc[:1000], leverage_scalar=3, holding_periods=holding_periods)
+    tracker = utilities.ATHTracker.from_dict(json.loads(json.dumps(tracker.to_dict()))) # Same path as save() / load()
+    new_bars, matured = tracker.update(data['Date'].iloc[1000:], data['Adj Close'].iloc[1000:])
+
+    np.testing.assert_allclose(new_bars['Leveraged Price'].to_numpy(), leveraged['Leveraged Price'].to_numpy()[1000:], rtol=1e-10)
+    np.testing.assert_array_equal(new_bars['ATH'].to_numpy(), ath_mask[1000:])
+    np.testing.assert_array_equal(new_bars['52W'].to_numpy(), high_mask[1000:])
+
+    # Every holding period that ends on a new bar matures, in bar order then holding period order
+    expected = pd.DataFrame([{'Date': data['Date'].iloc[row - holding_period], 'Holding Period': period_name,
+                              'Return': forward_returns[row - holding_period, i],
+                              'ATH': ath_mask[row - holding_period], '52W': high_mask[row - holding_period]}
+                             for row in range(1000, 1200) for i, (period_name, holding_period) in enumerate(holding_periods.items())])
+    pd.testing.assert_frame_equal(matured, expected, check_dtype=False, rtol=1e-10)
+
+
+#########################################################################################################################################################
+def loop_returns_all_periods(data, ath_indices, price_column, holding_periods, ath=True):
+    """The original row-by-row ATH (ath=True) and non-ATH (ath=False) return calculators, kept as the reference for the vectorized versions."""
+    results = []
+    for idx in (ath_indices if ath else [idx for idx in data.index if idx not in ath_indices]):
+        row = {'ATH_Index' if ath else 'Index': idx, 'Date': data.loc[idx, 'Date']}
+        for period_name, holding_period in holding_periods.items():
+            if idx + holding_period < len(data):
+                entry_price = data[price_column].iloc[idx]
+                exit_price = data[price_column].iloc[idx + holding_period]
+                row[period_name] = (exit_price - entry_price) / entry_price
+            else:
+                row[period_name] = None
+        results.append(row)
+    return pd.DataFrame(results).astype({period_name: 'float64' for period_name in holding_periods}) # An all-None column would be object dtype
+
+
+@pytest.mark.parametrize('high_type', ["ATH", "52W"])
+@pytest.mark.parametrize('window', [0, 5])
+def test_return_calculators_match_loop(high_type, window):
+    bars = make_bars(1500, seed=13) # Highs both early (all holding periods fit) and late (the longer ones run past the end)
+    data = utilities.leverage_dataframe(pd.DataFrame({'Date': bars.index, 'Adj Close': bars['Adj Close'].to_numpy()}), 3)
+    holding_periods = {'Return_3M': 91, 'Return_12M': 365, 'Return_48M': 1460}
+    ath_indices = utilities.find_ath_indices(data, 'Leveraged Price', high_type, window)
+    ath_mask = utilities.find_ath_mask(data, 'Leveraged Price', high_type, window)
+
+    expected_ath = loop_returns_all_periods(data, ath_indices, 'Leveraged Price', holding_periods, ath=True)
+    expected_non_ath = loop_returns_all_periods(data, ath_indices, 'Leveraged Price', holding_periods, ath=False)
+    for highs in [ath_indices, ath_mask]: # List and boolean-mask inputs give the same frames
+        pd.testing.assert_frame_equal(utilities.calculate_ath_returns_all_periods(data, highs, 'Leveraged Price', holding_periods),
+                                      expected_ath, check_dtype=False)
+        pd.testing.assert_frame_equal(utilities.calculate_non_ath_returns_all_periods(data, highs, 'Leveraged Price', holding_periods),
+                                      expected_non_ath, check_dtype=False)
+
+
+#########################################################################################################################################################
+def test_returns_cache_is_bounded_by_bytes(monkeypatch):
+    bars = make_bars(2000, seed=4)
+    data = pd.DataFrame({'Date': bars.index, 'Adj Close': bars['Adj Close'].to_numpy()})
+    window_bytes = 2000 * 5 * 8  # Every row lands in the ATH or the non-ATH array of a window
+    monkeypatch.setattr(utilities, 'RETURNS_CACHE_BYTES', 3 * window_bytes)
+    utilities.clear_returns_cache()
+
+    first = utilities.compute_returns(data, [0, 5, 15, 30, 50], 'Adj Close')
+
+    assert len(utilities._RETURNS_CACHE) == 3
+    assert utilities._returns_cache_nbytes() <= 3 * window_bytes
+    second = utilities.compute_returns(data, [0, 5, 15, 30, 50], 'Adj Close') # Evicted windows are recomputed identically
+    for group, returns in first.groups.items():
+        np.testing.assert_array_equal(second.groups[group], returns)
+    utilities.clear_returns_cache()
+
+
+#########################################################################################################################################################
+def make_monthly(rows, seed=5):
+    """Monthly price history tagged like load_shiller_data() output."""
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({'Date': pd.date_range('1871-01-01', periods=rows, freq='MS'),
+                         'Adj Close': 10 * np.cumprod(1 + rng.normal(0.005, 0.04, rows))})
+    data.attrs.update(frequency='MS', periods_per_year=12)
+    return data
+
+
+def test_monthly_data_uses_monthly_lookback_and_holding_periods():
+    data = utilities.leverage_dataframe(make_monthly(600), 3)
+    holding_periods = {'Return_12M': 365, 'Return_48M': 1460}
+    expected_mask = utilities._high_mask(data['Leveraged Price'].to_numpy(), "52W", lookback=12)
+
+    analysis = utilities.compute_returns(data, [0, 2], 'Leveraged Price', "52W", holding_periods)
+    assert analysis.holding_periods == {'Return_12M': 12, 'Return_48M': 48}
+    assert list(analysis.groups) == ['Non-52-wk High (Window=0 months)', '52-wk High (Window=0 months)', '52-wk High (Window=2 months)']
+
+    tracker = utilities.ATHTracker.from_history(data.iloc[:500], leverage_scalar=3, holding_periods=holding_periods)
+    assert tracker.lookback == 12 and tracker.holding_periods == {'Return_12M': 12, 'Return_48M': 48}
+    tracker = utilities.ATHTracker.from_dict(tracker.to_dict())
+    bars, matured = tracker.update(data['Date'].iloc[500:], data['Adj Close'].iloc[500:])
+    np.testing.assert_array_equal(bars['52W'].to_numpy(), expected_mask[500:])
+
+    stats = utilities.bootstrap_ath_analysis(data, n_paths=3, price_column='Adj Close', leverage_scalar=3, high_type="52W",
+                                             holding_periods=holding_periods, seed=0)
+    assert stats['Return_48M_52W_Median'].notna().all()  # 48 rows fit in a 600-row path; 1460 unscaled rows would not
+
+
+#########################################################################################################################################################
+def test_leverage_sweep_without_costs_matches_leverage_dataframe():
+    bars = make_bars(1000, seed=6)
+    data = pd.DataFrame({'Date': bars.index, 'Adj Close': bars['Adj Close'].to_numpy()})
+
+    paths = utilities.simulate_leverage_levels(data['Adj Close'], [1, 2, 3])
+
+    for i, scalar in enumerate([1, 2, 3]):
+        np.testing.assert_array_equal(paths[:, i], utilities.leverage_dataframe(data.copy(), scalar)['Leveraged Price'].to_numpy())
+
+
+def test_leverage_sweep_charges_annual_costs_per_calendar_year():
+    dates = pd.bdate_range('2010-01-01', '2014-01-01')
+    data = pd.DataFrame({'Date': dates, 'Adj Close': np.full(len(dates), 100.0)}) # Flat price: only the costs move it
+    years = (dates[-1] - dates[0]).days / 365.25
+
+    sweep = utilities.leverage_sweep(data, [1, 3], expense_ratio=.0091, borrowing_cost=.05, holding_periods={})
+
+    annual_drag = -np.log(sweep['Final Price'].to_numpy() / 100) / years
+    np.testing.assert_allclose(annual_drag, [.0091, .0091 + .05 * 2], rtol=0.01)
+
+
+#########################################################################################################################################################
+def test_returns_by_drawdown_default_bins_per_metric():
+    bars = make_bars(3000, seed=7)
+    data = utilities.leverage_dataframe(pd.DataFrame({'Date': bars.index, 'Adj Close': bars['Adj Close'].to_numpy()}), 3)
+
+    by_depth = utilities.returns_by_drawdown(data, 'Leveraged Price')
+    by_days = utilities.returns_by_drawdown(data, 'Leveraged Price', by='Days Since High')
+
+    assert by_depth.drawdown_metric == 'Drawdown' and by_depth.high_type is None
+    assert list(by_days.groups) == ['At High', 'Days Since High 0-30', 'Days Since High 30-91', 'Days Since High 91-365',
+                                    'Days Since High 365-1460', 'Days Since High 1460-inf']
+    assert sum(len(returns) for returns in by_days.groups.values()) == len(data)  # Every row lands in a bucket
+    assert by_days.select(['Return_12M']).drawdown_metric == 'Days Since High'
+
+    monthly = utilities.returns_by_drawdown(make_monthly(600), 'Adj Close', by='Days Since High')
+    assert list(monthly.groups)[1] == 'Days Since High 0-1 months'
+
+
+#########################################################################################################################################################
+def test_profile_stages_keeps_the_peak_of_earlier_stages():
+    def two_stages():
+        with utilities._stage('test', 'large'):
+            large = np.ones(4_000_000) # ~30 MB, freed before the next stage
+            del large
+        with utilities._stage('test', 'small'):
+            small = np.ones(1000)
+
+    tracemalloc.start()
+    try:
+        with utilities.profile_stages() as profiler:
+            two_stages()
+            whole_block_peak = profiler.traced_peak_mb()
+    finally:
+        tracemalloc.stop()
+
+    stages = profiler.report().set_index('stage')
+    assert stages.loc['large', 'peak_mb'] > 25
+    assert stages.loc['small', 'peak_mb'] < 1
+    assert whole_block_peak > 25
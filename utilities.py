@@ -1,9 +1,316 @@
-import yfinance as yf
+import os
+import hashlib
+import json
+import time
+import tracemalloc
+import warnings
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+# yfinance, matplotlib and seaborn are imported inside the functions that use them, so the numerical
+# core (simulation, high detection, forward returns) only costs a NumPy/pandas import
+
+PRICE_CACHE_DIR = '.price_cache'  # Default on-disk location of the per-ticker price cache
+RETURNS_CACHE_SIZE = 128  # Max number of per-window return results kept by compute_returns()
+RETURNS_CACHE_BYTES = 256 * 2**20  # Max total size of the arrays kept by compute_returns() (a 1M-row window is ~40 MB)
+DAYS_PER_YEAR = 365  # Rows per year assumed for daily data (52W lookback and holding periods are counted in rows)
+TRADING_DAYS_PER_YEAR = 252  # Daily bars per year of exchange data, used to spread annual costs over rows
+DEFAULT_HOLDING_PERIODS = {'Return_3M': 91, 'Return_6M': 182, 'Return_12M': 365, 'Return_24M': 730, 'Return_48M': 1460}  # Label -> days; shared default of every analysis function
 #########################################################################################################################################################
-def process_leveraged_data(tickers, leverage_scalars, portfolio_weights=1):
+class StageProfiler:
+    """
+    Per-stage timings collected by profile_stages(). Each record is a dict with the 'function' and 'stage' names, wall time in 'seconds',
+    the number of 'rows' the stage produced (None when it does not apply), and, when memory is traced, 'allocated_mb' (memory still held
+    after the stage) and 'peak_mb' (highest memory use during the stage), both relative to the start of the stage.
+
+    Stages reset the tracemalloc peak, so inside a profile_stages() block tracemalloc.get_traced_memory()[1] only covers the time
+    since the last stage started. Use traced_peak_mb() for the peak over the whole block instead.
+
+    Attributes:
+        records (list of dict): One record per stage run, in the order they finished.
+        logger (logging.Logger or None): If given, every record is also logged at INFO level.
+    """
+
+    def __init__(self, logger=None):
+        self.records = []
+        self.logger = logger
+        self._traced_peak = 0 # Highest tracemalloc peak seen before a stage reset it
+
+    def traced_peak_mb(self):
+        """Traced memory peak in MB, as tracemalloc.get_traced_memory()[1] would report it had no stage reset the peak (0 if not tracing)."""
+        current_peak = tracemalloc.get_traced_memory()[1] if tracemalloc.is_tracing() else 0
+        return max(self._traced_peak, current_peak) / 2**20
+
+    def _add(self, record):
+        self.records.append(record)
+        if self.logger is not None:
+            memory = f", {record['allocated_mb']:.1f} MB allocated, {record['peak_mb']:.1f} MB peak" if 'peak_mb' in record else ""
+            self.logger.info("%s / %s: %.4fs, %s rows%s", record['function'], record['stage'], record['seconds'], record['rows'], memory)
+
+    def report(self):
+        """DataFrame with one row per recorded stage run."""
+        return pd.DataFrame(self.records, columns=['function', 'stage', 'seconds', 'rows', 'allocated_mb', 'peak_mb'])
+
+    def summary(self):
+        """Total time, number of calls, rows and worst peak memory per function and stage, slowest first."""
+        return (self.report().groupby(['function', 'stage'], sort=False)
+                .agg(seconds=('seconds', 'sum'), calls=('seconds', 'size'), rows=('rows', 'sum'), peak_mb=('peak_mb', 'max'))
+                .sort_values('seconds', ascending=False))
+
+
+_PROFILERS = []  # StageProfiler instances of the active profile_stages() blocks
+
+
+@contextmanager
+def profile_stages(logger=None, trace_memory=True):
+    """
+    Opt-in instrumentation: record the wall time, row count and memory of each stage of process_leveraged_data(), compute_returns()
+    and plot_returns() (downloading, leverage simulation, high detection, forward returns, melting, drawing, saving) run inside the block.
+    Outside such a block the stages cost nothing.
+
+    Parameters:
+        logger (logging.Logger or None): If given, log every stage as it finishes.
+        trace_memory (bool): If True, trace allocations with tracemalloc (slows allocation-heavy stages down). Default is True.
+
+    Returns:
+        StageProfiler: Holds the records; use .report() or .summary() for a DataFrame.
+
+    Example:
+        with profile_stages() as profiler:
+            plot_returns(process_leveraged_data(["QQQ", "SPY"], [3, 1], [.2, .8]), [0, 5, 15])
+        print(profiler.summary())
+    """
+    profiler = StageProfiler(logger)
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+    _PROFILERS.append(profiler)
+    try:
+        yield profiler
+    finally:
+        _PROFILERS.remove(profiler)
+        if started_tracing:
+            tracemalloc.stop()
+
+
+@contextmanager
+def _stage(function, stage):
+    """
+    Time one pipeline stage for the active profile_stages() blocks. The yielded dict takes the stage's row count (record['rows'] = n).
+    Stages are not nested, so each one can reset the tracemalloc peak; the peak reached so far is handed to the profilers first
+    (see StageProfiler.traced_peak_mb).
+    """
+    record = {'function': function, 'stage': stage, 'rows': None}
+    if not _PROFILERS: # Instrumentation is off
+        yield record
+        return
+
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        peak_so_far = tracemalloc.get_traced_memory()[1]
+        for profiler in _PROFILERS:
+            profiler._traced_peak = max(profiler._traced_peak, peak_so_far)
+        tracemalloc.reset_peak()
+        memory_start = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - start
+        if tracing:
+            memory_end, memory_peak = tracemalloc.get_traced_memory()
+            record['allocated_mb'] = (memory_end - memory_start) / 2**20
+            record['peak_mb'] = (memory_peak - memory_start) / 2**20
+        for profiler in _PROFILERS:
+            profiler._add(dict(record))
+
+
+#########################################################################################################################################################
+def _yf_download(ticker, start=None):
+    """
+    Default downloader used by load_price_history(). Any callable with the same signature can stand in for it (e.g., offline tests).
+
+    Parameters:
+        ticker (str): Ticker symbol to download (e.g., "SPY").
+        start (pd.Timestamp or None): First date to download. None downloads the full history.
+
+    Returns:
+        pd.DataFrame: Daily bars indexed by Date with one column per price field (e.g., 'Adj Close').
+    """
+    import yfinance as yf
+
+    bars = yf.download(ticker, start=start, progress=False)
+    if isinstance(bars.columns, pd.MultiIndex): # Newer yfinance versions return (Price, Ticker) column pairs
+        bars.columns = bars.columns.get_level_values(0)
+    return bars
+
+
+def _price_cache_path(ticker, cache_dir):
+    """Return the cache file used for a ticker."""
+    return os.path.join(cache_dir, f"{ticker.replace('/', '_')}.npz")
+
+
+def _read_price_cache(path):
+    """Read a cached price file written by _write_price_cache() back into a DataFrame indexed by Date."""
+    with np.load(path, allow_pickle=False) as cached:
+        index = pd.DatetimeIndex(cached['dates'].astype('datetime64[ns]'), name='Date')
+        return pd.DataFrame(cached['values'], index=index, columns=cached['columns'].tolist())
+
+
+def _write_price_cache(path, bars):
+    """Write daily bars to a columnar .npz file (dates, column names, and a dates x fields value matrix)."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f: # Write to a temp file first so an interrupted write never corrupts the cache
+        np.savez(f,
+                 dates=bars.index.values.astype('datetime64[ns]').astype('int64'),
+                 columns=np.array([str(col) for col in bars.columns]),
+                 values=bars.to_numpy(dtype='float64'))
+    os.replace(tmp_path, path)
+
+
+#########################################################################################################################################################
+def load_price_history(ticker, cache_dir=PRICE_CACHE_DIR, offline=False, downloader=None):
+    """
+    Load the daily price history for a ticker from the local price cache, downloading only the bars from the last cached date onwards.
+    Yahoo rewrites the whole adjusted history after every dividend or split, so if the re-fetched last cached bar no longer matches
+    the cache, the full history is downloaded again instead of appending new bars to an outdated basis.
+
+    Parameters:
+        ticker (str): Ticker symbol (e.g., "SPY").
+        cache_dir (str or None): Directory holding one cache file per ticker. None bypasses the cache and always downloads the full history.
+        offline (bool): If True, never download; the ticker must already be cached.
+        downloader (callable or None): Function called as downloader(ticker, start=None) returning daily bars indexed by Date. Default uses yfinance.
+
+    Returns:
+        pd.DataFrame: Daily bars indexed by Date (e.g., 'Open', 'High', 'Low', 'Close', 'Adj Close', 'Volume').
+    """
+    if downloader is None:
+        downloader = _yf_download
+
+    if cache_dir is None: # No cache, behave like a plain download
+        if offline:
+            raise ValueError("offline=True requires a cache_dir.")
+        bars = downloader(ticker, start=None)
+        bars.index.name = 'Date'
+        return bars
+
+    path = _price_cache_path(ticker, cache_dir)
+    cached = _read_price_cache(path) if os.path.exists(path) else None
+
+    if offline:
+        if cached is None:
+            raise FileNotFoundError(f"No cached prices for {ticker} in '{cache_dir}' and offline=True.")
+        return cached
+
+    if cached is None or cached.empty: # Nothing cached yet, download the full history
+        bars = downloader(ticker, start=None)
+    else: # Only fetch the bars from the last cached date onwards (that bar overlaps and checks the adjustment basis)
+        last_date = cached.index.max()
+        new_bars = downloader(ticker, start=last_date)
+        if new_bars is None or new_bars.empty:
+            return cached
+
+        overlap = new_bars['Adj Close'][new_bars.index == last_date]
+        if len(overlap) and np.isclose(overlap.iloc[-1], cached['Adj Close'].iloc[-1], rtol=1e-6, atol=0):
+            new_bars = new_bars[new_bars.index > last_date]
+            if new_bars.empty:
+                return cached
+            bars = pd.concat([cached, new_bars[cached.columns]])
+        else: # Dividend/split since the last refresh (or no overlapping bar): the cached basis is stale
+            bars = downloader(ticker, start=None)
+
+    bars.index.name = 'Date'
+    _write_price_cache(path, bars)
+    return bars
+
+
+#########################################################################################################################################################
+def load_price_matrix(tickers, price_field='Adj Close', cache_dir=PRICE_CACHE_DIR, offline=False, downloader=None, max_workers=None):
+    """
+    Fetch several tickers concurrently and align them once into a dates x tickers price matrix.
+
+    Parameters:
+        tickers (list of str): List of ticker symbols (e.g., ["QQQ", "SPY"]).
+        price_field (str): The price field to keep from each ticker's bars. Default is 'Adj Close'.
+        cache_dir (str or None): Directory of the local price cache (see load_price_history).
+        offline (bool): If True, only use cached prices and never download.
+        downloader (callable or None): Stand-in for the yfinance downloader (see load_price_history).
+        max_workers (int or None): Number of download threads. Default is one per ticker.
+
+    Returns:
+        tuple: (pd.DatetimeIndex of dates, np.ndarray of prices with shape (dates, tickers)). Dates start at the latest first date
+               across all tickers; days where a ticker has no bar are NaN.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def fetch(ticker):
+        print(f"Downloading data for {ticker}...")
+        return load_price_history(ticker, cache_dir=cache_dir, offline=offline, downloader=downloader)[price_field]
+
+    # Downloads are I/O bound, so threads are enough to overlap them
+    with ThreadPoolExecutor(max_workers=max_workers or len(tickers)) as pool:
+        series = list(pool.map(fetch, tickers))
+
+    # Align on the union of dates, starting at the latest first date across all tickers
+    start_date = max(s.index.min() for s in series)
+    dates = series[0].index
+    for s in series[1:]:
+        dates = dates.union(s.index)
+    dates = dates[dates >= start_date]
+
+    prices = np.empty((len(dates), len(tickers)))
+    for i, s in enumerate(series):
+        prices[:, i] = s.reindex(dates).to_numpy(dtype='float64')
+
+    return dates, prices
+
+
+#########################################################################################################################################################
+def simulate_portfolio_matrix(prices, leverage_scalars, portfolio_weights):
+    """
+    Simulate the leveraged and weighted price paths of every ticker in one pass over a dates x tickers price matrix.
+
+    Parameters:
+        prices (np.ndarray): Price matrix with shape (dates, tickers); NaN where a ticker has no bar (see load_price_matrix).
+        leverage_scalars (list of float): Leverage scalar for each ticker (e.g., [3, 1]).
+        portfolio_weights (list of float): Portfolio weight for each ticker (e.g., [.2, .8]).
+
+    Returns:
+        dict: Matrices with shape (dates, tickers) for 'daily_returns', 'leveraged_returns', 'weighted_returns' and 'leveraged_prices',
+              the 'unleveraged_portfolio_price' vector, and a 'valid_rows' mask of the dates where every ticker has a daily return.
+    """
+    scalars = np.asarray(leverage_scalars, dtype='float64')
+    weights = np.asarray(portfolio_weights, dtype='float64')
+    missing = np.isnan(prices)
+
+    # Forward fill gaps so each ticker's return spans from its previous bar (same as pct_change on the ticker alone)
+    filled = pd.DataFrame(prices).ffill().to_numpy()
+    daily_returns = np.full(prices.shape, np.nan)
+    daily_returns[1:] = filled[1:] / filled[:-1] - 1
+    daily_returns[missing] = np.nan
+
+    # First return of each ticker (and any gap) is 0 so the compounded price starts at the first price
+    leveraged_returns = daily_returns * scalars
+    leveraged_returns[np.isnan(leveraged_returns)] = 0
+    weighted_returns = leveraged_returns * weights
+
+    first_prices = pd.DataFrame(prices).bfill().to_numpy()[0]
+    leveraged_prices = np.cumprod(1 + weighted_returns, axis=0) * first_prices
+
+    return {
+        'daily_returns': daily_returns,
+        'leveraged_returns': leveraged_returns,
+        'weighted_returns': weighted_returns,
+        'leveraged_prices': leveraged_prices,
+        'unleveraged_portfolio_price': (prices * weights).sum(axis=1),
+        'valid_rows': ~np.isnan(daily_returns).any(axis=1),
+    }
+
+
+#########################################################################################################################################################
+def process_leveraged_data(tickers, leverage_scalars, portfolio_weights=1, cache_dir=PRICE_CACHE_DIR, offline=False, downloader=None):
     """
     Download historical data for given tickers, simulate leveraged ETF data, 
     and calculate their weighted contributions to the portfolio based on the number of tickers provided.
@@ -12,6 +319,9 @@ def process_leveraged_data(tickers, leverage_scalars, portfolio_weights=1):
         tickers (list of str): List of ticker symbols (e.g., ["QQQ", "SPY"]).
         leverage_scalars (list of float): List of scalars for leveraged equity returns (e.g., [3, 1]).
         portfolio_weights (list of float): List of portfolio weights for each ticker; must sum to 1 (e.g., [.2, .8]). Default is 1 as it assumes a single-ticker case.
+        cache_dir (str or None): Directory of the local price cache (see load_price_history). None always downloads the full history.
+        offline (bool): If True, only use cached prices and never download.
+        downloader (callable or None): Stand-in for the yfinance downloader (see load_price_history).
 
     Returns:
         pd.DataFrame: DataFrame with formatted columns for each ticker and weighted portfolio returns.
@@ -21,31 +331,37 @@ def process_leveraged_data(tickers, leverage_scalars, portfolio_weights=1):
         ticker = tickers  # Assign single ticker directly
 
         print(f"Downloading data for {ticker}...")
-        baseline_data = yf.download(ticker, progress=False)
+        with _stage('process_leveraged_data', 'download') as stage:
+            baseline_data = load_price_history(ticker, cache_dir=cache_dir, offline=offline, downloader=downloader)
+            stage['rows'] = len(baseline_data)
 
         # Ensure leverage_scalar is valid
         if not isinstance(leverage_scalars, (int, float)):
             raise ValueError("For a single ticker, leverage_scalars must be a single numerical value.")
 
-        # Calculate daily returns (pct_change introduces NaN in the first row)
-        baseline_data['Daily Return'] = baseline_data['Adj Close'].pct_change()
+        with _stage('process_leveraged_data', 'simulate leverage') as stage:
+            # Calculate daily returns (pct_change introduces NaN in the first row)
+            baseline_data['Daily Return'] = baseline_data['Adj Close'].pct_change()
 
-        # Simulate leveraged returns (remove NaN for first row calculation)
-        baseline_data['Leveraged Return'] = baseline_data['Daily Return'] * leverage_scalars
-        baseline_data.loc[baseline_data.index[0], 'Leveraged Return'] = 0  # Ensure the first leveraged return is 0
+            # Simulate leveraged returns (remove NaN for first row calculation)
+            baseline_data['Leveraged Return'] = baseline_data['Daily Return'] * leverage_scalars
+            baseline_data.loc[baseline_data.index[0], 'Leveraged Return'] = 0  # Ensure the first leveraged return is 0
 
-        # Initialize the simulated leveraged price column
-        baseline_data['Simulated Leveraged Price'] = baseline_data['Adj Close'].iloc[0]  # Starting price
-        
-        # Calculate cumulative price using Leveraged Return (vectorized operation)
-        baseline_data['Simulated Leveraged Price'] = (1 + baseline_data['Leveraged Return']).cumprod()
-        baseline_data['Simulated Leveraged Price'] *= baseline_data['Adj Close'].iloc[0]  # Normalize to starting price
+            # Initialize the simulated leveraged price column
+            baseline_data['Simulated Leveraged Price'] = baseline_data['Adj Close'].iloc[0]  # Starting price
+
+            # Calculate cumulative price using Leveraged Return (vectorized operation)
+            baseline_data['Simulated Leveraged Price'] = (1 + baseline_data['Leveraged Return']).cumprod()
+            baseline_data['Simulated Leveraged Price'] *= baseline_data['Adj Close'].iloc[0]  # Normalize to starting price
+            stage['rows'] = len(baseline_data)
 
-        # Reset index to convert Date from index to a column
-        baseline_data.reset_index(inplace=True)
+        with _stage('process_leveraged_data', 'assemble frame') as stage:
+            # Reset index to convert Date from index to a column
+            baseline_data.reset_index(inplace=True)
 
-        # Drop the 'Ticker' row (if present in the DataFrame)
-        baseline_data = baseline_data[baseline_data['Date'] != ticker]
+            # Drop the 'Ticker' row (if present in the DataFrame)
+            baseline_data = baseline_data[baseline_data['Date'] != ticker]
+            stage['rows'] = len(baseline_data)
 
         return baseline_data
 
@@ -57,79 +373,144 @@ def process_leveraged_data(tickers, leverage_scalars, portfolio_weights=1):
     if not abs(sum(portfolio_weights) - 1.0) < 1e-6: # Check if portfolio_weights sums to 1
         raise ValueError("Portfolio weights must sum to 1.")
 
-    # Find the latest first date across all tickers
-    start_date = None
-    for ticker in tickers:
-        ticker_data = yf.download(ticker, progress=False)
-        earliest_date = ticker_data.index.min()
-        if start_date is None or earliest_date > start_date:
-            start_date = earliest_date
+    # Fetch every ticker concurrently and align them once into a dates x tickers matrix
+    with _stage('process_leveraged_data', 'download') as stage:
+        dates, prices = load_price_matrix(tickers, cache_dir=cache_dir, offline=offline, downloader=downloader)
+        stage['rows'] = len(dates)
+    with _stage('process_leveraged_data', 'simulate leverage') as stage:
+        simulated = simulate_portfolio_matrix(prices, leverage_scalars, portfolio_weights)
+        valid_rows = simulated['valid_rows']
+        stage['rows'] = len(dates)
 
-    result_df = pd.DataFrame()  # Initialize an empty DataFrame for results
+    with _stage('process_leveraged_data', 'assemble frame') as stage:
+        # Assemble the wide DataFrame (same columns and order as the per-ticker merge it replaces)
+        columns = {'Date': dates[valid_rows]}
+        for i, (ticker, scalar) in enumerate(zip(tickers, leverage_scalars)):
+            columns[f'DailyReturn_{ticker}'] = simulated['daily_returns'][valid_rows, i]
+            columns[f'AdjClose_{ticker}'] = prices[valid_rows, i]
+            columns[f'LeveragedReturn_{ticker}_{scalar}X'] = simulated['leveraged_returns'][valid_rows, i]
+            columns[f'SimulatedLeveragedPrice_{ticker}_{scalar}X'] = simulated['leveraged_prices'][valid_rows, i]
+            columns[f'WeightedLeveragedReturn_{ticker}_{scalar}X'] = simulated['weighted_returns'][valid_rows, i]
 
-    for ticker, scalar, weight in zip(tickers, leverage_scalars, portfolio_weights):
-        print(f"Downloading data for {ticker}...")
+        # Portfolio columns come straight from the matrices
+        columns['UnleveragedPortfolioPrice'] = simulated['unleveraged_portfolio_price'][valid_rows]
+        columns['TotalPortfolioReturn'] = simulated['leveraged_returns'][valid_rows].sum(axis=1)
+        columns['TotalPortfolioPrice'] = simulated['leveraged_prices'][valid_rows].sum(axis=1)
 
-        # Download the baseline data
-        baseline_data = yf.download(ticker, progress=False)
+        portfolio_data = pd.DataFrame(columns)
+        stage['rows'] = len(portfolio_data)
 
-        # Drop rows before the latest start date
-        baseline_data = baseline_data[baseline_data.index >= start_date]
-        baseline_data = baseline_data.copy() # Make copy to stop slicing issues
+    return portfolio_data
 
-        # Calculate daily returns
-        baseline_data['Daily Return'] = baseline_data['Adj Close'].pct_change()
 
-        # Simulate leveraged returns based on the scalar
-        baseline_data['Leveraged Return'] = baseline_data['Daily Return'] * scalar
-        baseline_data.loc[baseline_data.index[0], 'Leveraged Return'] = 0  # Ensure the first leveraged return is 0
-        
-        # Weighted leveraged return
-        baseline_data['Weighted Leveraged Return'] = baseline_data['Leveraged Return'] * weight
-        
-        # Calculate simulated leveraged price
-        baseline_data['Simulated Leveraged Price'] = (1 + baseline_data['Weighted Leveraged Return']).cumprod()
-        baseline_data['Simulated Leveraged Price'] *= baseline_data['Adj Close'].iloc[0]  # Normalize to starting price
-
-        # Rename columns to include the ticker symbol
-        baseline_data = baseline_data.rename(
-            columns={
-                'Daily Return': f'DailyReturn_{ticker}',
-                'Adj Close': f'AdjClose_{ticker}',
-                'Leveraged Return': f'LeveragedReturn_{ticker}_{scalar}X',
-                'Simulated Leveraged Price': f'SimulatedLeveragedPrice_{ticker}_{scalar}X',
-                'Weighted Leveraged Return': f'WeightedLeveragedReturn_{ticker}_{scalar}X'
-            }
-        )
-
-        # Keep only relevant columns and reset index
-        baseline_data = baseline_data[[f'DailyReturn_{ticker}', 
-                                       f'AdjClose_{ticker}', 
-                                       f'LeveragedReturn_{ticker}_{scalar}X', 
-                                       f'SimulatedLeveragedPrice_{ticker}_{scalar}X', 
-                                       f'WeightedLeveragedReturn_{ticker}_{scalar}X']]
-        
-        baseline_data.reset_index(inplace=True)
+#########################################################################################################################################################
+def _periods_per_year(data):
+    """Rows per year of a DataFrame: set by load_shiller_data() (12 for monthly data), otherwise daily (DAYS_PER_YEAR)."""
+    return data.attrs.get('periods_per_year', DAYS_PER_YEAR)
+
+
+def _period_unit(periods_per_year):
+    """Name of one row for window labels: 'days' for daily data, 'months' for monthly data, otherwise 'rows'."""
+    return {DAYS_PER_YEAR: 'days', 12: 'months'}.get(periods_per_year, 'rows')
+
+
+def _rows_per_year(data):
+    """Actual rows per year of a DataFrame from its 'Date' span (about 252 for daily exchange bars, 12 for monthly data)."""
+    if 'Date' in data.columns and len(data) > 1:
+        dates = pd.to_datetime(data['Date'])
+        years = (dates.iloc[-1] - dates.iloc[0]).total_seconds() / (365.25 * 86400)
+        if years > 0:
+            return (len(data) - 1) / years
+    return TRADING_DAYS_PER_YEAR if _periods_per_year(data) == DAYS_PER_YEAR else _periods_per_year(data)
+
+
+def scale_holding_periods(holding_periods, periods_per_year):
+    """
+    Convert holding periods counted in days into rows of a series with a different frequency.
+
+    Parameters:
+        holding_periods (dict): Holding period labels mapped to their number of days (e.g., {'Return_12M': 365}).
+        periods_per_year (int): Rows per year of the series (e.g., 12 for monthly data).
+
+    Returns:
+        dict: The same labels mapped to their number of rows (e.g., {'Return_12M': 12} for monthly data).
+    """
+    if periods_per_year == DAYS_PER_YEAR:
+        return dict(holding_periods)
+    return {name: max(1, int(round(days * periods_per_year / DAYS_PER_YEAR))) for name, days in holding_periods.items()}
 
-        # Merge with the result DataFrame
-        if result_df.empty:
-            result_df = baseline_data
-        else:
-            result_df = pd.merge(result_df, baseline_data, on='Date', how='outer')
 
-    # Calculate total portfolio adjusted close price (weighted by portfolio weights)
-    adjusted_close_columns = [col for col in result_df.columns if col.startswith('AdjClose')]
-    result_df['UnleveragedPortfolioPrice'] = sum(result_df[col] * weight for col, weight in zip(adjusted_close_columns, portfolio_weights))
+def _file_sha1(path):
+    """SHA-1 of a file's contents."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
 
-    # Calculate total portfolio returns
-    weighted_columns_1 = [col for col in result_df.columns if col.startswith('LeveragedReturn')]
-    result_df['TotalPortfolioReturn'] = result_df[weighted_columns_1].sum(axis=1)
-    # Calculate total portfolio price
-    weighted_columns_2 = [col for col in result_df.columns if col.startswith('SimulatedLeveragedPrice')]
-    result_df['TotalPortfolioPrice'] = result_df[weighted_columns_2].sum(axis=1)
 
+#########################################################################################################################################################
+def load_shiller_data(path='ie_data.xls', cache_dir=PRICE_CACHE_DIR):
+    """
+    Load the monthly real price series from Robert Shiller's ie_data.xls workbook, ready for leverage_dataframe().
+    The workbook is parsed once and stored as a memory-mappable .npy cache, which is rebuilt when the source file changes.
+
+    Parameters:
+        path (str): Path to the Shiller workbook. Default is 'ie_data.xls'.
+        cache_dir (str or None): Directory for the binary cache. None always parses the workbook.
 
-    return result_df.dropna().reset_index(drop=True)
+    Returns:
+        pd.DataFrame: DataFrame with 'Date' (first day of each month) and 'Adj Close' (real price) columns and a 0..n index.
+                      data.attrs['frequency'] is 'MS' and data.attrs['periods_per_year'] is 12, so holding periods and the
+                      52W lookback are converted from days to months by the analysis functions.
+    """
+    source_stat = os.stat(path)
+    cache_path = meta_path = None
+    prices = None
+
+    if cache_dir is not None:
+        cache_name = 'shiller_' + os.path.splitext(os.path.basename(path))[0]
+        cache_path = os.path.join(cache_dir, cache_name + '.npy')
+        meta_path = os.path.join(cache_dir, cache_name + '.json')
+
+        # Reuse the cache if the source is unchanged (same mtime and size, or same contents after a touch)
+        if os.path.exists(cache_path) and os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            unchanged = (meta['mtime_ns'] == source_stat.st_mtime_ns and meta['size'] == source_stat.st_size)
+            if not unchanged and meta['size'] == source_stat.st_size and meta['sha1'] == _file_sha1(path):
+                unchanged = True
+                meta['mtime_ns'] = source_stat.st_mtime_ns
+                with open(meta_path, 'w') as f:
+                    json.dump(meta, f)
+            if unchanged:
+                prices = np.load(cache_path, mmap_mode='r')
+
+    if prices is None:
+        # Parse the workbook: Date is column 0 and the real price column 7, below 7 header rows
+        raw = pd.read_excel(path, sheet_name='Data')
+        raw = raw.iloc[7:, [0, 7]].apply(pd.to_numeric, errors='coerce').dropna()
+
+        # Fractional-year dates: 1871.01 is January 1871 and 1871.1 is October 1871
+        years = np.floor(raw.iloc[:, 0].to_numpy()).astype('int64')
+        months = np.round((raw.iloc[:, 0].to_numpy() - years) * 100).astype('int64')
+        dates = pd.to_datetime(pd.DataFrame({'year': years, 'month': months, 'day': 1}))
+
+        prices = np.empty(len(raw), dtype=[('date', 'int64'), ('price', 'float64')])
+        prices['date'] = dates.to_numpy(dtype='datetime64[ns]').astype('int64')
+        prices['price'] = raw.iloc[:, 1].to_numpy(dtype='float64')
+
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            np.save(cache_path, prices)
+            with open(meta_path, 'w') as f:
+                json.dump({'mtime_ns': source_stat.st_mtime_ns, 'size': source_stat.st_size, 'sha1': _file_sha1(path)}, f)
+
+    data = pd.DataFrame({'Date': pd.to_datetime(np.asarray(prices['date']).astype('datetime64[ns]')),
+                         'Adj Close': np.array(prices['price'])})
+    data.attrs['frequency'] = 'MS'
+    data.attrs['periods_per_year'] = 12
+    return data
 
 
 #########################################################################################################################################################
@@ -163,8 +544,129 @@ def leverage_dataframe(data, scalar):
     return data
 
 
+def _leveraged_prices(adj_close, scalar):
+    """
+    Array version of leverage_dataframe(): simulate the leveraged price path of a 1-D adjusted close array.
+
+    Parameters:
+        adj_close (np.ndarray): Adjusted close prices (NaNs are forward filled).
+        scalar (float): The leverage scalar to apply.
+
+    Returns:
+        np.ndarray: The leveraged price path, starting at the first adjusted close price.
+    """
+    adj_close = pd.Series(adj_close, dtype='float64').ffill().to_numpy()
+    leveraged_returns = np.zeros(len(adj_close)) # First row has no prior return
+    leveraged_returns[1:] = (adj_close[1:] / adj_close[:-1] - 1) * scalar
+    return np.cumprod(1 + leveraged_returns) * adj_close[0]
+
+
+def simulate_leverage_levels(adj_close, leverage_scalars, expense_ratio=0, borrowing_cost=0, periods_per_year=TRADING_DAYS_PER_YEAR):
+    """
+    Simulate the leveraged price path of many leverage scalars (and cost models) in one broadcast pass, without touching the source DataFrame.
+
+    Parameters:
+        adj_close (array-like): Adjusted close prices as a 1-D array or Series (e.g., data['Adj Close']; NaNs are forward filled).
+        leverage_scalars (list of float): Leverage scalars to simulate (e.g., np.arange(1, 4.25, .25)).
+        expense_ratio (float or list of float): Annual expense ratio charged on the fund (e.g., .0091 for 0.91%), one value or one per scalar. Default is 0.
+        borrowing_cost (float or list of float): Annual cost of borrowing the exposure above 1x (e.g., .05), one value or one per scalar. Default is 0.
+        periods_per_year (float): Rows per year used to turn the annual costs into a per-row drag. Default is TRADING_DAYS_PER_YEAR (daily bars).
+
+    Returns:
+        np.ndarray: Leveraged prices with shape (dates, scalars), every path starting at the first adjusted close price.
+                    Without costs each column equals leverage_dataframe()'s 'Leveraged Price' for that scalar.
+    """
+    adj_close = pd.Series(np.asarray(adj_close, dtype='float64')).ffill().to_numpy()
+    scalars = np.asarray(leverage_scalars, dtype='float64').reshape(-1)
+
+    # Per-row drag of each level: the expense ratio on the fund plus the borrowing cost on the exposure above 1x
+    drag = (np.broadcast_to(np.asarray(expense_ratio, dtype='float64'), scalars.shape)
+            + np.broadcast_to(np.asarray(borrowing_cost, dtype='float64'), scalars.shape) * np.maximum(scalars - 1, 0)) / periods_per_year
+
+    # One (dates x scalars) buffer holds the returns and is compounded in place into the prices
+    paths = np.zeros((len(adj_close), len(scalars))) # First row has no prior return
+    np.multiply((adj_close[1:] / adj_close[:-1] - 1)[:, None], scalars, out=paths[1:])
+    if np.any(drag):
+        paths[1:] -= drag
+    paths += 1
+    np.cumprod(paths, axis=0, out=paths)
+    paths *= adj_close[0]
+    return paths
+
+
+#########################################################################################################################################################
+def _high_mask(values, high_type="ATH", window=0, lookback=DAYS_PER_YEAR):
+    """
+    Vectorized high detection along axis 0 of a 1-D price array or a 2-D (dates x series) price matrix.
+
+    Parameters:
+        values (np.ndarray): Prices to evaluate for highs.
+        high_type (str): "ATH" (new all-time high) or "52W" (at or above the rolling 52-week high).
+        window (int): Number of rows to expand each high by (± window). Default is 0.
+        lookback (int): Number of trailing rows in the 52-week window. Default is DAYS_PER_YEAR (daily rows).
+
+    Returns:
+        np.ndarray: Boolean mask with the same shape as values.
+    """
+    if high_type not in ["ATH", "52W"]:
+        raise ValueError("Invalid high_type. Use 'ATH' for all-time high or '52W' for 52-week high.")
+
+    values = np.asarray(values, dtype='float64')
+
+    if high_type == "ATH":
+        # A new ATH is strictly above the running max of all previous rows (NaNs are skipped, first row compares against -9999)
+        previous_max = np.full(values.shape, -9999.0)
+        if len(values) > 1:
+            previous_max[1:] = np.fmax(np.fmax.accumulate(values[:-1], axis=0), -9999.0)
+        mask = values > previous_max
+
+    else:
+        # A 52-week high is at or above the max of the trailing lookback rows plus the current row (rolling max is O(n))
+        columns = int(np.prod(values.shape[1:])) # Explicit so an empty array still reshapes
+        rolling_max = pd.DataFrame(values.reshape(len(values), columns)).rolling(lookback + 1, min_periods=1).max().to_numpy()
+        mask = values >= rolling_max.reshape(values.shape)
+
+    return _dilate_mask(mask, window)
+
+
+def _dilate_mask(mask, window):
+    """Expand every True row of a boolean mask by ± window rows along axis 0 using a cumulative count."""
+    if window <= 0:
+        return mask
+
+    n = len(mask)
+    counts = np.zeros((n + 1,) + mask.shape[1:], dtype='int64')
+    np.cumsum(mask, axis=0, out=counts[1:])
+
+    # A row is kept if any True falls inside [row - window, row + window]
+    rows = np.arange(n)
+    upper = np.minimum(rows + window + 1, n)
+    lower = np.maximum(rows - window, 0)
+    return (counts[upper] - counts[lower]) > 0
+
+
+#########################################################################################################################################################
+def find_ath_mask(data, price_column, high_type="ATH", window=0, lookback=None):
+    """
+    Vectorized version of find_ath_indices() that returns a boolean mask instead of a list of indices.
+
+    Parameters:
+        data (pd.DataFrame): The DataFrame containing the data.
+        price_column (str): The column name containing prices to evaluate for highs.
+        high_type (str): The type of high to calculate: "ATH" (all-time high) or "52W" (52-week high).
+        window (int): Number of rows to expand the indices by (± window): days for daily data, months for monthly data. Default is 0.
+        lookback (int or None): Number of trailing rows in the 52-week window. Default uses the data's frequency (365 rows for daily data, 12 for monthly data from load_shiller_data).
+
+    Returns:
+        np.ndarray: Boolean mask with one entry per row of data; True where a new high is set, optionally expanded.
+    """
+    if lookback is None:
+        lookback = _periods_per_year(data)
+    return _high_mask(data[price_column].to_numpy(dtype='float64'), high_type, window, lookback)
+
+
 #########################################################################################################################################################
-def find_ath_indices(data, price_column, high_type="ATH", window=0):
+def find_ath_indices(data, price_column, high_type="ATH", window=0, lookback=None):
     """
     Find indices where the column reaches a new all-time high and optionally expand indices by window of days.
     
@@ -172,176 +674,612 @@ def find_ath_indices(data, price_column, high_type="ATH", window=0):
         data (pd.DataFrame): The DataFrame containing the data.
         price_column (str): The column name containing prices to evaluate for highs.
         high_type (str): The type of high to calculate: "ATH" (all-time high) or "52W" (52-week high).
-        window (int): Number of days to expand the indices by (± window). Default is 0.
+        window (int): Number of rows to expand the indices by (± window): days for daily data, months for monthly data. Default is 0.
+        lookback (int or None): Number of trailing rows in the 52-week window. Default uses the data's frequency (see find_ath_mask).
     
     Returns:
         list: List of indices where a new all-time high is set, optionally expanded.
     """
+    ath_mask = find_ath_mask(data, price_column, high_type, window, lookback)
+    return data.index[ath_mask].tolist()
 
-    if high_type not in ["ATH", "52W"]:
-        raise ValueError("Invalid high_type. Use 'ATH' for all-time high or '52W' for 52-week high.")
 
-    ath_indices = []
-    
-    if high_type == "ATH":
-        current_ath = -9999 # Init the current_ath with a super low number
-        # Find new all-time highs
-        for idx, value in data[price_column].items():
-            if value > current_ath:
-                current_ath = value
-                ath_indices.append(idx)
-    
-    elif high_type == "52W":
-        # Calculate 52-week highs (365-day rolling high)
-        for idx in data.index:
-            start_idx = max(0, idx - 365) # Ensure the start index is within bounds
-            if data[price_column].iloc[idx] >= data[price_column].iloc[start_idx:idx + 1].max():
-                ath_indices.append(idx)
+#########################################################################################################################################################
+def _forward_returns(values, holding_period):
+    """
+    Forward return of every row along axis 0 of a 1-D price array or 2-D (dates x series) price matrix.
+
+    Parameters:
+        values (np.ndarray): Prices to calculate returns on.
+        holding_period (int): Number of rows between the entry and exit price.
+
+    Returns:
+        np.ndarray: Array with the same shape as values; NaN where the holding period runs past the last row.
+    """
+    values = np.asarray(values, dtype='float64')
+    returns = np.full(values.shape, np.nan)
+    if holding_period < len(values):
+        entry_price = values[:len(values) - holding_period]
+        exit_price = values[holding_period:]
+        returns[:len(values) - holding_period] = (exit_price - entry_price) / entry_price
+    return returns
+
+
+def forward_returns_matrix(data, price_column, holding_periods):
+    """
+    Calculate the forward return of every row for every holding period at once.
+
+    Parameters:
+        data (pd.DataFrame): DataFrame containing the price data.
+        price_column (str): The column name containing prices to calculate returns on.
+        holding_periods (dict): A dictionary where keys are holding period labels (e.g., 'Return_3M') and values are the number of days in the holding period (e.g., 91 for 3 months).
+
+    Returns:
+        np.ndarray: Array with shape (len(data), len(holding_periods)); NaN where the holding period exceeds the data's last day.
+    """
+    values = data[price_column].to_numpy(dtype='float64')
+    returns = np.empty((len(values), len(holding_periods)))
+    for i, holding_period in enumerate(holding_periods.values()):
+        returns[:, i] = _forward_returns(values, holding_period)
+    return returns
 
-    
-    # Expand indices if window > 0
-    if window > 0:
-        expanded_indices = set() # This code avoids duplicate indices 
-        for idx in ath_indices:
-            # Add indices in the range [idx - window, idx + window] to the expanded set
-            for offset in range(-window, window + 1):  # ±window range
-                new_idx = idx + offset
-                if 0 <= new_idx < len(data):  # Ensure within bounds
-                    expanded_indices.add(new_idx)
-        ath_indices = sorted(expanded_indices)
-    
-    return ath_indices
+
+def _ath_positions_mask(ath_indices, n):
+    """Turn a list of ATH indices (or an existing boolean mask) into a boolean mask of length n."""
+    if isinstance(ath_indices, np.ndarray) and ath_indices.dtype == bool:
+        return ath_indices
+    mask = np.zeros(n, dtype=bool)
+    mask[np.asarray(ath_indices, dtype='int64')] = True
+    return mask
 
 
 #########################################################################################################################################################
-def calculate_ath_returns_all_periods(data, ath_indices, price_column, holding_periods):
+def calculate_ath_returns_all_periods(data, ath_indices, price_column, holding_periods, forward_returns=None):
     """
     Calculate returns for a portfolio after reaching all-time highs (ATH) over various holding periods.
 
     Parameters:
         data (pd.DataFrame): DataFrame containing portfolio price data and the corresponding Date.
-        ath_indices (list of int): List of indices of intrest in the portfolio.
+        ath_indices (list of int or np.ndarray of bool): List of indices of intrest in the portfolio, or a boolean mask from find_ath_mask().
         price_column (str): The column name containing prices to calculate returns on.
         holding_periods (dict): A dictionary where keys are holding period labels (e.g., 'Return_3M') and values are the number of days in the holding period (e.g., 91 for 3 months).
+        forward_returns (np.ndarray or None): Precomputed output of forward_returns_matrix() to reuse. Default computes it.
 
     Returns:
         pd.DataFrame: DataFrame containing ATH indices, corresponding dates, and returns for specified holding periods.
     """
-    
-    results = []
-    for idx in ath_indices:
-        row = {'ATH_Index': idx, 'Date': data.loc[idx, 'Date']}
-        # Loop through each holding period and calculate returns
-        for period_name, holding_period in holding_periods.items():
-            if idx + holding_period < len(data): # Check if holding period is inside data's last day
-                entry_price = data[price_column].iloc[idx]
-                exit_price = data[price_column].iloc[idx + holding_period]
-                return_pct = (exit_price - entry_price) / entry_price
-                row[period_name] = return_pct
-            else:
-                row[period_name] = None  # Handle cases where holding period exceeds data length
+    if forward_returns is None:
+        forward_returns = forward_returns_matrix(data, price_column, holding_periods)
 
-        results.append(row)
+    # Select the ATH rows (keeping the order the indices were given in)
+    if isinstance(ath_indices, np.ndarray) and ath_indices.dtype == bool:
+        positions = np.flatnonzero(ath_indices)
+    else:
+        positions = np.asarray(ath_indices, dtype='int64')
 
-    return pd.DataFrame(results)
+    results = pd.DataFrame(forward_returns[positions], columns=list(holding_periods.keys()))
+    results.insert(0, 'ATH_Index', data.index[positions])
+    results.insert(1, 'Date', data['Date'].to_numpy()[positions])
+    return results
 
 
 #########################################################################################################################################################
-def calculate_non_ath_returns_all_periods(data, ath_indices, price_column, holding_periods):
+def calculate_non_ath_returns_all_periods(data, ath_indices, price_column, holding_periods, forward_returns=None):
     """
     Calculate returns for portfolio indices that are NOT all-time highs (ATH) over various holding periods.
 
     Parameters:
         data (pd.DataFrame): DataFrame containing portfolio price data and the corresponding Date.
-        ath_indices (list of int): List of indices of intrest in the portfolio.
+        ath_indices (list of int or np.ndarray of bool): List of indices of intrest in the portfolio, or a boolean mask from find_ath_mask().
         price_column (str): The column name containing prices to calculate returns on.
         holding_periods (dict): A dictionary where keys are holding period labels (e.g., 'Return_3M') and values are the number of days in the holding period (e.g., 91 for 3 months).
+        forward_returns (np.ndarray or None): Precomputed output of forward_returns_matrix() to reuse. Default computes it.
 
     Returns:
         pd.DataFrame: DataFrame containing non-ATH indices, corresponding dates, and returns for specified holding periods.
     """    
-    
-    results = []
-    for idx in data.index:
-        if idx not in ath_indices:  # Exclude ATH indices
-            row = {'Index': idx, 'Date': data.loc[idx, 'Date']}
-            # Loop through each holding period and calculate returns
-            for period_name, holding_period in holding_periods.items():
-                if idx + holding_period < len(data):  # Check if holding period is inside data's last day
-                    entry_price = data[price_column].iloc[idx]
-                    exit_price = data[price_column].iloc[idx + holding_period]
-                    return_pct = (exit_price - entry_price) / entry_price
-                    row[period_name] = return_pct
-                else:
-                    row[period_name] = None  # Handle cases where holding period exceeds data length
-            
-            results.append(row)
+    if forward_returns is None:
+        forward_returns = forward_returns_matrix(data, price_column, holding_periods)
 
-    return pd.DataFrame(results)
+    # Exclude ATH indices with a mask instead of a list lookup per row
+    non_ath_mask = ~_ath_positions_mask(ath_indices, len(data))
+
+    results = pd.DataFrame(forward_returns[non_ath_mask], columns=list(holding_periods.keys()))
+    results.insert(0, 'Index', data.index[non_ath_mask])
+    results.insert(1, 'Date', data['Date'].to_numpy()[non_ath_mask])
+    return results
 
 
 #########################################################################################################################################################
-def plot_returns(data, windows, price_column='TotalPortfolioPrice', high_type="ATH", plot_relative=False, holding_periods={'Return_3M': 91,'Return_6M': 182,'Return_12M': 365,'Return_24M': 730,'Return_48M': 1460,}):
+class ReturnAnalysis:
     """
-    Visualize forward price returns across various time periods for All-Time High (ATH) or other high types.
+    Forward returns grouped by high/non-high entry points, as computed by compute_returns(), or by drawdown bucket, as computed by returns_by_drawdown().
+
+    Attributes:
+        price_column (str): The column the returns were calculated on.
+        high_type (str or None): "ATH" or "52W" (None when grouped by a drawdown metric).
+        windows (list of int): The window sizes analyzed, in rows (days for daily data, months for monthly data).
+        holding_periods (dict): Holding period labels mapped to their number of days.
+        groups (dict): Group label (e.g., 'ATH (Window=5 days)') mapped to an array of returns with shape (entries, holding periods).
+        drawdown_metric (str or None): The drawdown metric the groups are buckets of (e.g., 'Drawdown'), None for high/non-high groups.
+    """
+
+    def __init__(self, price_column, high_type, windows, holding_periods, groups, drawdown_metric=None):
+        self.price_column = price_column
+        self.high_type = high_type
+        self.windows = list(windows)
+        self.holding_periods = dict(holding_periods)
+        self.groups = groups
+        self.drawdown_metric = drawdown_metric
+
+    def __repr__(self):
+        grouping = f"drawdown_metric={self.drawdown_metric!r}" if self.drawdown_metric else f"high_type={self.high_type!r}, windows={self.windows}"
+        return f"ReturnAnalysis(price_column={self.price_column!r}, {grouping}, holding_periods={list(self.holding_periods)})"
+
+    def select(self, period_names):
+        """Return a new ReturnAnalysis restricted to a subset of the holding periods (no recomputation)."""
+        columns = [list(self.holding_periods).index(name) for name in period_names]
+        return ReturnAnalysis(self.price_column, self.high_type, self.windows,
+                              {name: self.holding_periods[name] for name in period_names},
+                              {group: returns[:, columns] for group, returns in self.groups.items()}, self.drawdown_metric)
+
+    def to_long_frame(self):
+        """Long-form DataFrame with 'Group', 'Holding Period' and 'Return' columns (the layout seaborn expects)."""
+        frames = []
+        for i, period_name in enumerate(self.holding_periods):
+            for group, returns in self.groups.items():
+                frames.append(pd.DataFrame({'Group': group, 'Holding Period': period_name, 'Return': returns[:, i]}))
+        return pd.concat(frames, ignore_index=True)
+
+    def box_stats(self, max_fliers=1000):
+        """Box-plot statistics for every holding period and group, ready for plot_box_stats() (see box_stats())."""
+        return {period_name: {group: box_stats(returns[:, i], label=group, max_fliers=max_fliers) for group, returns in self.groups.items()}
+                for i, period_name in enumerate(self.holding_periods)}
+
+    def summary(self):
+        """Descriptive statistics (like DataFrame.describe) for every group and holding period, ignoring NaN returns."""
+        rows = []
+        for group, returns in self.groups.items():
+            for i, period_name in enumerate(self.holding_periods):
+                values = returns[:, i]
+                values = values[~np.isnan(values)]
+                row = {'Group': group, 'Holding Period': period_name, 'count': len(values)}
+                if len(values):
+                    q1, median, q3 = np.percentile(values, [25, 50, 75])
+                    row.update({'mean': values.mean(), 'std': values.std(ddof=1) if len(values) > 1 else np.nan,
+                                'min': values.min(), '25%': q1, '50%': median, '75%': q3, 'max': values.max()})
+                rows.append(row)
+        return pd.DataFrame(rows).set_index(['Group', 'Holding Period'])
+
+
+_RETURNS_CACHE = OrderedDict()  # (fingerprint, price column, high_type, window, lookback, holding periods) -> (ATH returns, non-ATH returns)
+
+
+def _returns_cache_nbytes():
+    """Total size of the return arrays held by the compute_returns() cache."""
+    return sum(returns.nbytes for result in _RETURNS_CACHE.values() for returns in result)
+
+
+def clear_returns_cache():
+    """Empty the memoization cache used by compute_returns()."""
+    _RETURNS_CACHE.clear()
+
+
+def _column_fingerprint(values):
+    """Hash of a price array so cached results are only reused for identical data."""
+    return (len(values), hashlib.sha1(np.ascontiguousarray(values).tobytes()).hexdigest())
+
+
+def _cached_window_returns(key):
+    """
+    Look up a per-window result in the LRU cache. A cached entry computed for a superset of the requested
+    holding periods is sliced down instead of being recomputed.
+    """
+    if key in _RETURNS_CACHE:
+        _RETURNS_CACHE.move_to_end(key)
+        return _RETURNS_CACHE[key]
+
+    requested = key[-1]
+    for cached_key, (ath_returns, non_ath_returns) in reversed(_RETURNS_CACHE.items()):
+        cached_periods = cached_key[-1]
+        if cached_key[:-1] == key[:-1] and set(requested) <= set(cached_periods):
+            columns = [cached_periods.index(period) for period in requested]
+            _RETURNS_CACHE.move_to_end(cached_key)
+            return ath_returns[:, columns], non_ath_returns[:, columns]
+
+    return None
+
+
+def _store_window_returns(key, result):
+    """
+    Add a per-window result to the LRU cache, evicting the least recently used entries past RETURNS_CACHE_SIZE entries
+    or RETURNS_CACHE_BYTES in total. A result larger than RETURNS_CACHE_BYTES on its own is not cached.
+    """
+    if sum(returns.nbytes for returns in result) > RETURNS_CACHE_BYTES:
+        return
+    for returns in result:
+        returns.flags.writeable = False # Cached arrays are shared between callers
+    _RETURNS_CACHE[key] = result
+    while len(_RETURNS_CACHE) > RETURNS_CACHE_SIZE or _returns_cache_nbytes() > RETURNS_CACHE_BYTES:
+        _RETURNS_CACHE.popitem(last=False)
+
+
+#########################################################################################################################################################
+def compute_returns(data, windows, price_column='TotalPortfolioPrice', high_type="ATH", holding_periods=DEFAULT_HOLDING_PERIODS):
+    """
+    Compute forward returns at and away from highs for every window without plotting. Per-window results are memoized
+    (keyed by the price data, price column, high_type, window and holding periods), so repeated calls are free.
 
     Parameters:
         data (pd.DataFrame): The input DataFrame containing portfolio price data and relevant columns.
-        windows (list of int): List of window sizes defining the range of days before and after an ATH event to include in the analysis.
+        windows (list of int): List of window sizes defining the range of rows before and after an ATH event to include in the analysis.
+                               Unlike holding periods, windows are not converted: they count days for daily data and months for monthly data.
         price_column (str): The column name containing portfolio prices. Default is 'TotalPortfolioPrice'.
-        high_type (str): Type of high to analyze, either 'ATH' (All-Time High) or other high types like '52-wk High'. Default is 'ATH'.
-        plot_relative (bool): If True, plot side-by-side charts for leveraged and unleveraged performance using the same strategy (buying at unleveraged high points). 
+        high_type (str): Type of high to analyze, either 'ATH' (All-Time High) or '52W' (52-week high). Default is 'ATH'.
         holding_periods (dict): A dictionary where keys are holding period labels (e.g., 'Return_3M') and values are the number of days in the holding period (e.g., 91 for 3 months).
+                                For non-daily data (e.g., monthly data from load_shiller_data) the days are converted to rows.
 
     Returns:
-        Boxplot showing forward price returns for different holding periods.
+        ReturnAnalysis: Returns for the non-high group (smallest window only) and each window's high group.
     """
-    ####################### Create a df of the leveraged returns #######################
-    combined_results = []
+    holding_periods = scale_holding_periods(holding_periods, _periods_per_year(data)) # Day counts -> rows for non-daily data
+    lookback = _periods_per_year(data)
+    values = data[price_column].to_numpy(dtype='float64')
+    fingerprint = _column_fingerprint(values)
+    periods_key = tuple(holding_periods.items())
+    high_label = "ATH" if high_type == "ATH" else "52-wk High"
+    unit = _period_unit(lookback) # Windows count rows, e.g. months for monthly data
+
+    forward_returns = None
+    groups = {}
     min_w = min(windows)  # Find the minimum window value
     for w in windows:
-        # Calling find_ath_indices w/ user defined params 
-        ath_indices_leveraged = find_ath_indices(data, price_column, high_type, window=w)
+        key = (fingerprint, price_column, high_type, w, lookback, periods_key)
+        result = _cached_window_returns(key)
+        if result is None:
+            if forward_returns is None: # Computed once, shared by every window that misses the cache
+                with _stage('compute_returns', 'forward returns') as stage:
+                    forward_returns = forward_returns_matrix(data, price_column, holding_periods)
+                    stage['rows'] = len(forward_returns)
+            with _stage('compute_returns', 'high detection') as stage:
+                ath_mask = _high_mask(values, high_type, w, lookback)
+                result = (forward_returns[ath_mask], forward_returns[~ath_mask])
+                stage['rows'] = len(ath_mask)
+            _store_window_returns(key, result)
+
+        ath_returns, non_ath_returns = result
+        if w == min_w:
+            groups[f'Non-{high_label} (Window={min_w} {unit})'] = non_ath_returns  # Only include non-ATH data for the smallest window
+        groups[f'{high_label} (Window={w} {unit})'] = ath_returns
 
-        # ATH returns
-        ath_returns_df = calculate_ath_returns_all_periods(data, ath_indices_leveraged, price_column, holding_periods)
-        non_ath_returns_df = calculate_non_ath_returns_all_periods(data, ath_indices_leveraged, price_column, holding_periods)
+    return ReturnAnalysis(price_column, high_type, windows, holding_periods, groups)
 
-        # Add group flag
-        ath_returns_df['Group'] = f'{"ATH" if high_type == "ATH" else "52-wk High"} (Window={w} days)'
-        if w == min_w:
-            non_ath_returns_df['Group'] = f'Non-{"ATH" if high_type == "ATH" else "52-wk High"} (Window={min_w} days)'
-            combined_results.append(non_ath_returns_df)  # Only include non-ATH data for Window=0
 
-        # Combine results
-        combined_results.append(ath_returns_df)
+#########################################################################################################################################################
+DRAWDOWN_METRICS = ['ATH', 'Drawdown', 'Max Drawdown', 'Days Since High', 'Days To Recovery']  # Outputs of drawdown_matrix()
+
+
+def drawdown_matrix(values):
+    """
+    Drawdown, time-under-water and recovery of every row in one O(n) pass along axis 0 of a 1-D price array or a
+    2-D (dates x series) price matrix (e.g., portfolio components, leveraged vs unleveraged, bootstrap paths).
+
+    Parameters:
+        values (np.ndarray): Prices to evaluate. NaNs are skipped by the running high and give NaN metrics.
+
+    Returns:
+        dict: Arrays with the same shape as values:
+              'ATH': new all-time highs (same as find_ath_indices with high_type="ATH").
+              'Drawdown': price / running high - 1 (0 at a high, -0.25 when 25% below it).
+              'Max Drawdown': deepest drawdown since the last high.
+              'Days Since High': rows since the price was last at its running high (0 at a high).
+              'Days To Recovery': rows until the price is next back at its running high (0 at a high, NaN if it never recovers).
+              Days are counted in rows, i.e. calendar days for daily data.
+    """
+    values = np.asarray(values, dtype='float64')
+    n = len(values)
+    rows = np.arange(n, dtype='float64').reshape((n,) + (1,) * (values.ndim - 1))
+
+    running_high = np.fmax.accumulate(values, axis=0)
+    drawdown = values / running_high - 1
+    at_high = drawdown == 0
+
+    # Max drawdown since the last high: a cumulative min that restarts at every high. Shifting each stretch between highs
+    # down by 2 x (number of highs so far) keeps it below every earlier stretch (drawdowns lie in [-1, 0]), so one
+    # cumulative min over the whole column does the restart.
+    offset = 2.0 * np.cumsum(at_high, axis=0)
+    max_drawdown = np.fmin.accumulate(drawdown - offset, axis=0) + offset
+    max_drawdown[at_high] = 0
+
+    # Position of the previous (running max) and next (reverse running min) row at a high
+    last_high = np.maximum.accumulate(np.where(at_high, rows, -1), axis=0)
+    next_high = np.flip(np.minimum.accumulate(np.flip(np.where(at_high, rows, n), axis=0), axis=0), axis=0)
+    days_since_high = np.where(last_high >= 0, rows - last_high, np.nan)
+    days_to_recovery = np.where(next_high < n, next_high - rows, np.nan)
+
+    missing = np.isnan(values)
+    for metric in (drawdown, max_drawdown, days_since_high, days_to_recovery):
+        metric[missing] = np.nan
+
+    return {
+        'ATH': _high_mask(values, "ATH"),
+        'Drawdown': drawdown,
+        'Max Drawdown': max_drawdown,
+        'Days Since High': days_since_high,
+        'Days To Recovery': days_to_recovery,
+    }
+
+
+def drawdown_profile(data, price_column):
+    """
+    Drawdown metrics (see drawdown_matrix) for one or several price columns of a DataFrame.
+
+    Parameters:
+        data (pd.DataFrame): DataFrame containing a 'Date' column and the price data.
+        price_column (str or list of str): The column(s) to evaluate (e.g., ['TotalPortfolioPrice', 'UnleveragedPortfolioPrice']).
+
+    Returns:
+        pd.DataFrame: 'Date' plus the DRAWDOWN_METRICS columns for a single column, or '{metric}_{column}' columns for a list of columns.
+    """
+    columns = price_column if isinstance(price_column, list) else [price_column]
+    metrics = drawdown_matrix(data[columns].to_numpy(dtype='float64'))
+
+    profile = {'Date': data['Date'].to_numpy()}
+    for i, column in enumerate(columns):
+        for metric in DRAWDOWN_METRICS:
+            profile[metric if isinstance(price_column, str) else f'{metric}_{column}'] = metrics[metric][:, i]
+    return pd.DataFrame(profile, index=data.index)
+
+
+DRAWDOWN_BINS = {  # Default bucket edges of returns_by_drawdown(): depth below the high, or days (converted to rows for non-daily data)
+    'Drawdown': (0, .1, .2, .3, .5, 1),
+    'Max Drawdown': (0, .1, .2, .3, .5, 1),
+    'Days Since High': (0, 30, 91, 365, 1460, np.inf),
+    'Days To Recovery': (0, 30, 91, 365, 1460, np.inf),
+}
+
+
+def returns_by_drawdown(data, price_column, by='Drawdown', bins=None, holding_periods=DEFAULT_HOLDING_PERIODS):
+    """
+    Group forward returns by how far below (or how long since) the last high the entry point was, as an extra dimension to the high/non-high split.
+
+    Parameters:
+        data (pd.DataFrame): The input DataFrame containing the price data.
+        price_column (str): The column name containing prices.
+        by (str): The drawdown metric to bucket by: 'Drawdown', 'Max Drawdown', 'Days Since High' or 'Days To Recovery'. Default is 'Drawdown'.
+        bins (list of float or None): Bucket edges. Drawdowns are bucketed by depth (e.g., .1 for 10% below the high), days by rows (e.g., [0, 30, 91, 365, 1460]).
+                                      Entries at a high form their own 'At High' group; entries outside the edges are left out.
+                                      Default is DRAWDOWN_BINS[by] (day edges are converted to rows for non-daily data).
+        holding_periods (dict): A dictionary where keys are holding period labels (e.g., 'Return_3M') and values are the number of days in the holding period (e.g., 91 for 3 months).
+                                For non-daily data (e.g., monthly data from load_shiller_data) the days are converted to rows.
+
+    Returns:
+        ReturnAnalysis: One group per bucket (e.g., 'Drawdown 10%-20%'), ready for .summary(), .box_stats() or plot_box_stats().
+    """
+    if by not in DRAWDOWN_METRICS[1:]:
+        raise ValueError(f"Invalid by. Use one of {DRAWDOWN_METRICS[1:]}.")
+
+    periods_per_year = _periods_per_year(data)
+    holding_periods = scale_holding_periods(holding_periods, periods_per_year) # Day counts -> rows for non-daily data
+    if bins is None:
+        bins = DRAWDOWN_BINS[by]
+        if by in ['Days Since High', 'Days To Recovery']:
+            bins = [0] + [max(1, round(edge * periods_per_year / DAYS_PER_YEAR)) if np.isfinite(edge) else edge for edge in bins[1:]] # Days -> rows
+    values = data[price_column].to_numpy(dtype='float64')
+    metric = drawdown_matrix(values)[by]
+    if by in ['Drawdown', 'Max Drawdown']:
+        metric = -metric  # Bucket by depth below the high
+        label = lambda low, high: f"{by} {low:.0%}-{high:.0%}"
+    else:
+        unit = '' if periods_per_year == DAYS_PER_YEAR else f" {_period_unit(periods_per_year)}" # e.g., 'Days Since High 1-3 months'
+        label = lambda low, high: f"{by} {low:g}-{high:g}{unit}"
+
+    forward_returns = forward_returns_matrix(data, price_column, holding_periods)
+    buckets = pd.cut(metric, bins, labels=False)  # Bucket i holds (bins[i], bins[i + 1]]
+
+    groups = {'At High': forward_returns[metric == 0]}
+    for i, (low, high) in enumerate(zip(bins[:-1], bins[1:])):
+        groups[label(low, high)] = forward_returns[buckets == i]
+
+    return ReturnAnalysis(price_column, None, [], holding_periods, groups, drawdown_metric=by)
+
+
+#########################################################################################################################################################
+def _box_stats_from_sorted(sample, count, minimum, maximum, mean, label, whis, max_fliers):
+    """Box-plot statistics (matplotlib bxp format) from a sorted sample plus the exact count, min, max and mean."""
+    if count == 0:
+        return {'label': label, 'med': np.nan, 'q1': np.nan, 'q3': np.nan, 'whislo': np.nan, 'whishi': np.nan, 'mean': np.nan, 'fliers': np.array([]), 'count': 0}
+
+    q1, med, q3 = np.percentile(sample, [25, 50, 75])
+    low_fence, high_fence = q1 - whis * (q3 - q1), q3 + whis * (q3 - q1)
+
+    # Whiskers reach the most extreme values inside the fences (the exact min/max when they are inside)
+    inside = sample[(sample >= low_fence) & (sample <= high_fence)]
+    whislo = minimum if minimum >= low_fence else (inside[0] if len(inside) else q1)
+    whishi = maximum if maximum <= high_fence else (inside[-1] if len(inside) else q3)
+
+    # Keep an evenly spaced subset of the outliers so the plot stays small
+    fliers = sample[(sample < low_fence) | (sample > high_fence)]
+    if len(fliers) > max_fliers:
+        fliers = fliers[np.linspace(0, len(fliers) - 1, max_fliers).astype('int64')]
 
-    # # Join to a single df
-    final_combined_df = pd.concat(combined_results)
+    return {'label': label, 'med': med, 'q1': q1, 'q3': q3, 'whislo': whislo, 'whishi': whishi, 'mean': mean, 'fliers': fliers, 'count': count}
 
-    # Melt DataFrame for the two groups & their holding periods
-    melted_df = final_combined_df.melt(
-        id_vars=['Group'], 
-        value_vars=list(holding_periods.keys()), 
-        var_name='Holding Period', 
-        value_name='Return'
-    )
+
+def box_stats(values, label=None, whis=1.5, max_fliers=1000):
+    """
+    Compute the statistics drawn by a box plot (quartiles, whiskers and outliers) directly from an array of returns.
+
+    Parameters:
+        values (array-like): Returns to summarize; NaNs are ignored.
+        label (str or None): Label stored with the statistics (e.g., the group name).
+        whis (float): Whisker length as a multiple of the IQR (same as seaborn/matplotlib). Default is 1.5.
+        max_fliers (int): Max number of outliers kept for plotting. Default is 1000.
+
+    Returns:
+        dict: Statistics in the format expected by matplotlib's Axes.bxp ('med', 'q1', 'q3', 'whislo', 'whishi', 'fliers', ...).
+    """
+    values = np.asarray(values, dtype='float64')
+    sample = np.sort(values[~np.isnan(values)])
+    if len(sample) == 0:
+        return _box_stats_from_sorted(sample, 0, np.nan, np.nan, np.nan, label, whis, max_fliers)
+    return _box_stats_from_sorted(sample, len(sample), sample[0], sample[-1], sample.mean(), label, whis, max_fliers)
+
+
+class BoxStatsAccumulator:
+    """
+    Streaming version of box_stats() for returns that arrive in chunks (e.g., bootstrap_paths() output). The count, mean, min
+    and max are exact; quartiles, whiskers and outliers are approximated from a uniform random sample of bounded size.
+
+    Parameters:
+        sample_size (int): Max number of values kept for the quantile estimates. Default is 100,000.
+        seed (int or None): Seed for the sampling.
+    """
+
+    def __init__(self, sample_size=100_000, seed=None):
+        self.sample_size = sample_size
+        self.rng = np.random.default_rng(seed)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = np.inf
+        self.maximum = -np.inf
+        self.sample = np.array([])
+        self.keys = np.array([])
+
+    def update(self, values):
+        """Add a chunk of returns (NaNs are ignored)."""
+        values = np.asarray(values, dtype='float64').ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+        self.count += len(values)
+        self.total += values.sum()
+        self.minimum = min(self.minimum, values.min())
+        self.maximum = max(self.maximum, values.max())
+
+        # Bottom-k sampling: keep the values with the smallest random keys, a uniform sample of everything seen so far
+        keys = np.concatenate([self.keys, self.rng.random(len(values))])
+        sample = np.concatenate([self.sample, values])
+        if len(sample) > self.sample_size:
+            keep = np.argpartition(keys, self.sample_size)[:self.sample_size]
+            keys, sample = keys[keep], sample[keep]
+        self.keys, self.sample = keys, sample
+
+    def stats(self, label=None, whis=1.5, max_fliers=1000):
+        """Box-plot statistics of everything added so far (same format as box_stats())."""
+        mean = self.total / self.count if self.count else np.nan
+        return _box_stats_from_sorted(np.sort(self.sample), self.count, self.minimum, self.maximum, mean, label, whis, max_fliers)
+
+
+def plot_box_stats(stats, ax=None, palette='tab10'):
+    """
+    Draw grouped box plots from precomputed statistics with matplotlib's bxp, so memory does not scale with the number of returns.
+
+    Parameters:
+        stats (dict): Holding period label mapped to {group label: box statistics} (see ReturnAnalysis.box_stats()).
+        ax (matplotlib.axes.Axes or None): Axes to draw on. Default is the current axes.
+        palette (str): Matplotlib colormap used for the groups (one color per group, like seaborn's hue). Default is 'tab10'.
+
+    Returns:
+        matplotlib.axes.Axes: The axes drawn on.
+    """
+    import matplotlib.pyplot as plt
+
+    if ax is None:
+        ax = plt.gca()
+
+    period_names = list(stats)
+    groups = list(dict.fromkeys(group for period_stats in stats.values() for group in period_stats))
+    cmap = plt.get_cmap(palette)
+    colors = getattr(cmap, 'colors', None) or [cmap(i / max(len(groups) - 1, 1)) for i in range(len(groups))]
+    box_width = 0.8 / len(groups)  # Dodge the groups inside each holding period like seaborn's hue
+
+    for g, group in enumerate(groups):
+        group_stats = [stats[period_name][group] for period_name in period_names if group in stats[period_name]]
+        positions = [p - 0.4 + box_width * (g + 0.5) for p, period_name in enumerate(period_names) if group in stats[period_name]]
+        artists = ax.bxp(group_stats, positions=positions, widths=box_width * 0.9, patch_artist=True, showfliers=True, manage_ticks=False,
+                         boxprops={'facecolor': colors[g % len(colors)], 'edgecolor': '0.25'}, medianprops={'color': '0.25'},
+                         whiskerprops={'color': '0.25'}, capprops={'color': '0.25'},
+                         flierprops={'marker': 'o', 'markerfacecolor': 'none', 'markeredgecolor': '0.25'})
+        if artists['boxes']:
+            artists['boxes'][0].set_label(group) # One legend entry per group
+
+    ax.set_xticks(range(len(period_names)))
+    ax.set_xticklabels(period_names)
+    ax.set_xlim(-0.5, len(period_names) - 0.5)
+    return ax
+
+
+def _draw_returns_boxplot(ax, analysis, summary):
+    """Draw a ReturnAnalysis either with seaborn on the long-form returns or, in summary mode, from precomputed box statistics."""
+    if summary:
+        with _stage('plot_returns', 'box statistics') as stage:
+            stats = analysis.box_stats()
+            stage['rows'] = sum(len(returns) for returns in analysis.groups.values())
+        with _stage('plot_returns', 'draw'):
+            plot_box_stats(stats, ax=ax)
+    else:
+        import seaborn as sns
+        with _stage('plot_returns', 'melt') as stage:
+            long_frame = analysis.to_long_frame()
+            stage['rows'] = len(long_frame)
+        with _stage('plot_returns', 'draw') as stage:
+            sns.boxplot(
+                data=long_frame, 
+                x='Holding Period', 
+                y='Return', 
+                hue='Group', 
+                palette='tab10', 
+                ax=ax
+            )
+            stage['rows'] = len(long_frame)
+
+
+def _show_or_save(save_path):
+    """Show the current figure, or save it to save_path and close it."""
+    import matplotlib.pyplot as plt
+
+    with _stage('plot_returns', 'show' if save_path is None else 'save'):
+        if save_path is None:
+            plt.show()
+        else:
+            plt.savefig(save_path)
+            plt.close()
+
+
+#########################################################################################################################################################
+def plot_returns(data, windows, price_column='TotalPortfolioPrice', high_type="ATH", plot_relative=False, holding_periods=DEFAULT_HOLDING_PERIODS, summary=False, save_path=None):
+    """
+    Visualize forward price returns across various time periods for All-Time High (ATH) or other high types.
+
+    Parameters:
+        data (pd.DataFrame): The input DataFrame containing portfolio price data and relevant columns.
+        windows (list of int): List of window sizes defining the range of rows before and after an ATH event to include in the analysis.
+                               Unlike holding periods, windows are not converted: they count days for daily data and months for monthly data.
+        price_column (str): The column name containing portfolio prices. Default is 'TotalPortfolioPrice'.
+        high_type (str): Type of high to analyze, either 'ATH' (All-Time High) or other high types like '52-wk High'. Default is 'ATH'.
+        plot_relative (bool): If True, plot side-by-side charts for leveraged and unleveraged performance using the same strategy (buying at unleveraged high points). 
+        holding_periods (dict): A dictionary where keys are holding period labels (e.g., 'Return_3M') and values are the number of days in the holding period (e.g., 91 for 3 months).
+        summary (bool): If True, draw the boxes from precomputed quartiles/whiskers/outliers with matplotlib's bxp instead of handing every return to seaborn. 
+                        Use it for long histories (e.g., Shiller data) where the long-form DataFrame would be very large.
+        save_path (str or None): If given, save the figure to this file and close it instead of showing it (for headless rendering).
+
+    Returns:
+        Boxplot showing forward price returns for different holding periods.
+    """
+    ####################### Compute (or reuse) the leveraged returns #######################
+    analysis = compute_returns(data, windows, price_column, high_type, holding_periods)
 
 
 
     ####################### Dynamic Ploting of Returns #######################
+    import matplotlib.pyplot as plt
     from matplotlib.ticker import PercentFormatter, MaxNLocator
 
     if plot_relative == False: # Set to False by default
         # Single boxplot
         plt.figure(figsize=(14, 8))
-        sns.boxplot(
-            data=melted_df, 
-            x='Holding Period', 
-            y='Return', 
-            hue='Group', 
-            palette='tab10'
-        )
+        _draw_returns_boxplot(plt.gca(), analysis, summary)
         
         # Customize plot aesthetics
         plt.title('Forward Price Returns Across Time Periods')
@@ -354,22 +1292,15 @@ def plot_returns(data, windows, price_column='TotalPortfolioPrice', high_type="A
         plt.legend(title='Investment Type', bbox_to_anchor=(1.05, 1), loc='upper left')
         plt.tight_layout()
 
-        # Show the plot
-        plt.show()
+        # Show (or save) the plot
+        _show_or_save(save_path)
 
     else: # If plot_relative == True
         # Create a subplot w/ 2 boxplots
         fig, axes = plt.subplots(1, 2, figsize=(20, 8))
 
         # Left Boxplot: Leveraged (We already calculated this above)
-        sns.boxplot(
-            data=melted_df, 
-            x='Holding Period', 
-            y='Return', 
-            hue='Group', 
-            palette='tab10', 
-            ax=axes[0]
-        )
+        _draw_returns_boxplot(axes[0], analysis, summary)
         axes[0].set_title('Forward Price Returns Across Time Periods (Leveraged)')
         axes[0].set_xlabel('Holding Period')
         axes[0].set_ylabel('Return (%)')
@@ -380,44 +1311,9 @@ def plot_returns(data, windows, price_column='TotalPortfolioPrice', high_type="A
         axes[0].legend(title='Investment Type', loc='upper left')
 
         # Right Boxplot: Unleveraged
-        # We have to calculate the new df of the unleveraged returns
-        combined_results_unlev = [] 
-        min_w = min(windows)  # Find the minimum window value
-        for w in windows:
-            price_column_unlev = "UnleveragedPortfolioPrice" if "UnleveragedPortfolioPrice" in data.columns else "Adj Close" # Dynamic grab of the column of intrest
-            ath_indices_unleveraged = find_ath_indices(data, price_column_unlev, high_type, window=w)
-
-            # ATH returns
-            ath_returns_df_unlev = calculate_ath_returns_all_periods(data, ath_indices_unleveraged, price_column_unlev, holding_periods)
-            non_ath_returns_df_unlev = calculate_non_ath_returns_all_periods(data, ath_indices_unleveraged, price_column_unlev, holding_periods)
-
-            # Add group flag
-            ath_returns_df_unlev['Group'] = f'{"ATH" if high_type == "ATH" else "52-wk High"} (Window={w} days)'
-            if w == min_w:
-                non_ath_returns_df_unlev['Group'] = f'Non-{"ATH" if high_type == "ATH" else "52-wk High"} (Window={min_w} days)'
-                combined_results_unlev.append(non_ath_returns_df_unlev)  # Only include non-ATH data for Window=0
-
-            # Combine results
-            combined_results_unlev.append(ath_returns_df_unlev)
-
-        # # Join to a single df
-        final_combined_df_unlev = pd.concat(combined_results_unlev)
-
-        # Melt DataFrame for the two groups & their holding periods
-        second_melted_df = final_combined_df_unlev.melt(
-            id_vars=['Group'], 
-            value_vars=list(holding_periods.keys()), 
-            var_name='Holding Period', 
-            value_name='Return'
-        )
-        sns.boxplot(
-            data=second_melted_df,  
-            x='Holding Period', 
-            y='Return', 
-            hue='Group', 
-            palette='tab10', 
-            ax=axes[1]
-        )
+        price_column_unlev = "UnleveragedPortfolioPrice" if "UnleveragedPortfolioPrice" in data.columns else "Adj Close" # Dynamic grab of the column of intrest
+        analysis_unlev = compute_returns(data, windows, price_column_unlev, high_type, holding_periods)
+        _draw_returns_boxplot(axes[1], analysis_unlev, summary)
         axes[1].set_title('Forward Price Returns Across Time Periods (Unleveraged)')
         axes[1].set_xlabel('Holding Period')
         axes[1].set_ylabel('Return (%)')
@@ -430,6 +1326,508 @@ def plot_returns(data, windows, price_column='TotalPortfolioPrice', high_type="A
         # Adjust layout for better spacing
         plt.tight_layout()
 
-        # Show the plots
-        plt.show()
+        # Show (or save) the plots
+        _show_or_save(save_path)
+
+
+#########################################################################################################################################################
+def _high_return_stats(prices, high_type, window, holding_periods, lookback=DAYS_PER_YEAR):
+    """
+    Median forward return at and away from highs for every column of a (dates x series) price matrix.
+
+    Parameters:
+        prices (np.ndarray): Price matrix with one series per column.
+        high_type (str): "ATH" or "52W".
+        window (int): Number of rows (days for daily data) to expand each high by (± window).
+        holding_periods (dict): Holding period labels mapped to their number of days.
+        lookback (int): Number of trailing rows in the 52-week window. Default is DAYS_PER_YEAR (daily rows).
+
+    Returns:
+        dict: Column name (e.g., 'Return_12M_ATH_Median', 'Return_12M_NonATH_Median', 'ATH_Count') mapped to an array with one value per series.
+    """
+    high_mask = _high_mask(prices, high_type, window, lookback)
+    stats = {f'{high_type}_Count': high_mask.sum(axis=0), f'Non{high_type}_Count': (~high_mask).sum(axis=0)}
+
+    with warnings.catch_warnings(): # Series without any high (or any non-high) entry simply get NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        for period_name, holding_period in holding_periods.items():
+            forward_returns = _forward_returns(prices, holding_period)
+            stats[f'{period_name}_{high_type}_Median'] = np.nanmedian(np.where(high_mask, forward_returns, np.nan), axis=0)
+            stats[f'{period_name}_Non{high_type}_Median'] = np.nanmedian(np.where(high_mask, np.nan, forward_returns), axis=0)
 
+    return stats
+
+
+_SHARED_PRICES = {}  # Per-worker handle on the shared memory block used by screen_universe()
+
+
+def _attach_shared_prices(shm_name):
+    """Pool initializer: attach the worker to the shared price block once instead of pickling prices per task."""
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=shm_name)
+    _SHARED_PRICES['shm'] = shm
+    _SHARED_PRICES['prices'] = np.ndarray((shm.size // 8,), dtype='float64', buffer=shm.buf)
+
+
+def _screen_ticker(task):
+    """Worker: leverage one ticker's prices (read from shared memory) and summarize its forward returns."""
+    ticker, offset, length, scalar, high_type, window, holding_periods = task
+    adj_close = _SHARED_PRICES['prices'][offset:offset + length]
+    leveraged = _leveraged_prices(adj_close, scalar)
+    stats = _high_return_stats(leveraged.reshape(-1, 1), high_type, window, holding_periods)
+    row = {'Ticker': ticker, 'Rows': length}
+    row.update({name: values[0] for name, values in stats.items()})
+    return row
+
+
+#########################################################################################################################################################
+def screen_universe(tickers, leverage_scalar=1, high_type="ATH", window=0, holding_periods=DEFAULT_HOLDING_PERIODS,
+                    max_workers=None, chunksize=8, cache_dir=PRICE_CACHE_DIR, offline=True, downloader=None):
+    """
+    Run the leverage -> high detection -> forward-return analysis over a whole universe of tickers in a process pool.
+    Prices are passed to the workers through one shared memory block, and each worker returns a single summary row per ticker.
+
+    Parameters:
+        tickers (list of str): List of ticker symbols (e.g., S&P 500 constituents or sector ETFs).
+        leverage_scalar (float): The leverage scalar applied to every ticker. Default is 1 (unleveraged).
+        high_type (str): Type of high to analyze, either 'ATH' (All-Time High) or '52W' (52-week high). Default is 'ATH'.
+        window (int): Number of rows (days for daily data, months for monthly data) to expand each high by (± window). Default is 0.
+        holding_periods (dict): A dictionary where keys are holding period labels (e.g., 'Return_3M') and values are the number of days in the holding period (e.g., 91 for 3 months).
+        max_workers (int or None): Number of worker processes. Default uses every CPU.
+        chunksize (int): Number of tickers sent to a worker at a time.
+        cache_dir (str): Directory of the local price cache (see load_price_history).
+        offline (bool): If True (default), only use cached prices; tickers that are not cached are skipped.
+        downloader (callable or None): Stand-in for the yfinance downloader (see load_price_history).
+
+    Returns:
+        pd.DataFrame: One row per ticker with its date range, row count, high/non-high counts and median forward returns per holding period.
+    """
+    from multiprocessing import Pool, shared_memory
+
+    if high_type not in ["ATH", "52W"]:
+        raise ValueError("Invalid high_type. Use 'ATH' for all-time high or '52W' for 52-week high.")
+
+    # Load every ticker's adjusted close from the local price data
+    series = {}
+    for ticker in tickers:
+        try:
+            bars = load_price_history(ticker, cache_dir=cache_dir, offline=offline, downloader=downloader)
+        except FileNotFoundError:
+            print(f"Skipping {ticker}: no cached prices.")
+            continue
+        series[ticker] = bars['Adj Close'].dropna()
+
+    if not series:
+        return pd.DataFrame()
+
+    # Pack all price arrays back to back into a single shared memory block
+    lengths = [len(s) for s in series.values()]
+    offsets = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+    shm = shared_memory.SharedMemory(create=True, size=max(sum(lengths), 1) * 8)
+    try:
+        shared_prices = np.ndarray((sum(lengths),), dtype='float64', buffer=shm.buf)
+        for s, offset, length in zip(series.values(), offsets, lengths):
+            shared_prices[offset:offset + length] = s.to_numpy(dtype='float64')
+
+        tasks = [(ticker, int(offset), length, leverage_scalar, high_type, window, holding_periods)
+                 for ticker, offset, length in zip(series, offsets, lengths)]
+
+        # Stream summary rows back as soon as each chunk finishes
+        rows = []
+        with Pool(processes=max_workers, initializer=_attach_shared_prices, initargs=(shm.name,)) as pool:
+            for row in pool.imap_unordered(_screen_ticker, tasks, chunksize=chunksize):
+                row['Start'] = series[row['Ticker']].index.min()
+                row['End'] = series[row['Ticker']].index.max()
+                rows.append(row)
+        del shared_prices
+    finally:
+        shm.close()
+        shm.unlink()
+
+    # Put the table back in the order the tickers were given
+    results = pd.DataFrame(rows).set_index('Ticker').loc[list(series)].reset_index()
+    return results[['Ticker', 'Start', 'End', 'Rows'] + [col for col in results.columns if col not in ('Ticker', 'Start', 'End', 'Rows')]]
+
+
+#########################################################################################################################################################
+def portfolio_grid_search(tickers, weight_grid, leverage_scalars=1, high_type="ATH", window=0, holding_periods=DEFAULT_HOLDING_PERIODS,
+                          chunk_size=256, cache_dir=PRICE_CACHE_DIR, offline=False, downloader=None):
+    """
+    Compare many candidate portfolio allocations at once. Prices are loaded a single time, every candidate's TotalPortfolioPrice
+    path (as built by process_leveraged_data) is simulated in one batched array operation, and the high/non-high forward-return
+    statistics are calculated for every candidate. Candidates are processed in chunks so memory stays bounded.
+
+    Parameters:
+        tickers (list of str): List of ticker symbols (e.g., ["QQQ", "SPY", "SOXX"]).
+        weight_grid (array-like): Candidate portfolio weights with shape (candidates, tickers); each row must sum to 1.
+        leverage_scalars (float, list of float, or array-like): One scalar for every ticker, one per ticker (e.g., [3, 3, 3]),
+                                                               or a (candidates, tickers) matrix to vary leverage per candidate. Default is 1.
+        high_type (str): Type of high to analyze, either 'ATH' (All-Time High) or '52W' (52-week high). Default is 'ATH'.
+        window (int): Number of rows (days for daily data, months for monthly data) to expand each high by (± window). Default is 0.
+        holding_periods (dict): A dictionary where keys are holding period labels (e.g., 'Return_3M') and values are the number of days in the holding period (e.g., 91 for 3 months).
+        chunk_size (int): Number of candidates simulated per batch. Peak memory is roughly two dates x chunk_size float buffers
+                          (tickers are compounded one at a time), plus the high/forward-return statistics of the batch.
+        cache_dir (str or None): Directory of the local price cache (see load_price_history).
+        offline (bool): If True, only use cached prices and never download.
+        downloader (callable or None): Stand-in for the yfinance downloader (see load_price_history).
+
+    Returns:
+        pd.DataFrame: One row per candidate with its weights, leverage scalars, high/non-high counts and median forward returns per holding period.
+    """
+    weight_grid = np.atleast_2d(np.asarray(weight_grid, dtype='float64'))
+    n_candidates = len(weight_grid)
+    scalar_grid = np.broadcast_to(np.asarray(leverage_scalars, dtype='float64'), weight_grid.shape)
+
+    if weight_grid.shape[1] != len(tickers): # Check if there is a weight for each ticker
+        raise ValueError("weight_grid must have one column per ticker.")
+
+    if not np.all(np.abs(weight_grid.sum(axis=1) - 1.0) < 1e-6): # Check if every candidate's weights sum to 1
+        raise ValueError("Portfolio weights must sum to 1 for every candidate.")
+
+    # Load and align the prices once; unit scalars/weights give the raw daily returns (0 on each ticker's first day)
+    dates, prices = load_price_matrix(tickers, cache_dir=cache_dir, offline=offline, downloader=downloader)
+    simulated = simulate_portfolio_matrix(prices, np.ones(len(tickers)), np.ones(len(tickers)))
+    daily_returns = simulated['leveraged_returns']
+    valid_rows = simulated['valid_rows']
+    first_prices = pd.DataFrame(prices).bfill().to_numpy()[0]
+
+    results = []
+    for start in range(0, n_candidates, chunk_size):
+        stop = min(start + chunk_size, n_candidates)
+        weighted_scalars = weight_grid[start:stop] * scalar_grid[start:stop]  # (chunk, tickers)
+
+        # Compound one ticker at a time for every candidate in a reused (dates, chunk) buffer and add it to the portfolio paths
+        portfolio_paths = np.zeros((len(dates), stop - start))
+        ticker_paths = np.empty_like(portfolio_paths)
+        for i in range(len(tickers)):
+            np.multiply(daily_returns[:, i:i + 1], weighted_scalars[:, i], out=ticker_paths)
+            ticker_paths += 1
+            np.cumprod(ticker_paths, axis=0, out=ticker_paths)
+            ticker_paths *= first_prices[i]
+            portfolio_paths += ticker_paths
+        del ticker_paths
+        portfolio_paths = portfolio_paths[valid_rows]
+
+        stats = _high_return_stats(portfolio_paths, high_type, window, holding_periods)
+
+        chunk_results = {}
+        for i, ticker in enumerate(tickers):
+            chunk_results[f'Weight_{ticker}'] = weight_grid[start:stop, i]
+        for i, ticker in enumerate(tickers):
+            chunk_results[f'Leverage_{ticker}'] = scalar_grid[start:stop, i]
+        chunk_results.update(stats)
+        results.append(pd.DataFrame(chunk_results))
+
+    return pd.concat(results, ignore_index=True)
+
+
+#########################################################################################################################################################
+def leverage_sweep(data, leverage_scalars, price_column='Adj Close', high_type="ATH", window=0, holding_periods=DEFAULT_HOLDING_PERIODS,
+                   expense_ratio=0, borrowing_cost=0):
+    """
+    Compare many leverage levels (and cost models) on one price history. Every leveraged path is simulated in a single
+    broadcast pass (see simulate_leverage_levels) and the high/non-high forward-return statistics are calculated for all
+    levels at once, instead of calling leverage_dataframe() and plot_returns() once per scalar.
+
+    Parameters:
+        data (pd.DataFrame): DataFrame with the unleveraged price column (e.g., from process_leveraged_data or load_shiller_data). It is not modified.
+        leverage_scalars (list of float): Leverage scalars to compare (e.g., np.arange(1, 4.25, .25)).
+        price_column (str): The column with the unleveraged prices. Default is 'Adj Close'.
+        high_type (str): Type of high to analyze, either 'ATH' (All-Time High) or '52W' (52-week high). Default is 'ATH'.
+        window (int): Number of rows (days for daily data, months for monthly data) to expand each high by (± window). Default is 0.
+        holding_periods (dict): A dictionary where keys are holding period labels (e.g., 'Return_3M') and values are the number of days in the holding period (e.g., 91 for 3 months).
+                                For non-daily data (e.g., monthly data from load_shiller_data) the days are converted to rows.
+        expense_ratio (float or list of float): Annual expense ratio, one value or one per scalar (see simulate_leverage_levels). Default is 0.
+        borrowing_cost (float or list of float): Annual borrowing cost on the exposure above 1x, one value or one per scalar. Default is 0.
+                                                 Annual costs are spread over the rows per year measured from the 'Date' column.
+
+    Returns:
+        pd.DataFrame: One row per leverage level with its 'Leverage', 'Expense Ratio' and 'Borrowing Cost', the final leveraged price,
+                      high/non-high counts and median forward returns per holding period.
+    """
+    scalars = np.asarray(leverage_scalars, dtype='float64').reshape(-1)
+    periods_per_year = _periods_per_year(data)
+    holding_periods = scale_holding_periods(holding_periods, periods_per_year) # Day counts -> rows for non-daily data
+
+    # Costs accrue per calendar year, so spread them over the rows actually in a year (not the 365-row lookback convention)
+    paths = simulate_leverage_levels(data[price_column].to_numpy(), scalars, expense_ratio, borrowing_cost, _rows_per_year(data))
+    stats = _high_return_stats(paths, high_type, window, holding_periods, lookback=periods_per_year)
+
+    results = {
+        'Leverage': scalars,
+        'Expense Ratio': np.broadcast_to(np.asarray(expense_ratio, dtype='float64'), scalars.shape),
+        'Borrowing Cost': np.broadcast_to(np.asarray(borrowing_cost, dtype='float64'), scalars.shape),
+        'Final Price': paths[-1],
+    }
+    results.update(stats)
+    return pd.DataFrame(results)
+
+
+#########################################################################################################################################################
+def _bootstrap_chunk(daily_returns, start_price, n_paths, n_days, leverage_scalar, block_size, method, seed_sequence):
+    """
+    Generate one chunk of bootstrapped leveraged price paths.
+
+    Parameters:
+        daily_returns (np.ndarray): Historical daily returns to resample.
+        start_price (float): Price every path starts at.
+        n_paths (int): Number of paths in the chunk.
+        n_days (int): Number of days (prices) per path.
+        leverage_scalar (float): Scalar applied to every resampled daily return.
+        block_size (int): Block length ('block') or mean block length ('stationary').
+        method (str): 'stationary' (random geometric block lengths, wrapping around the history) or 'block' (fixed-length moving blocks).
+        seed_sequence (np.random.SeedSequence): Seed for this chunk.
+
+    Returns:
+        np.ndarray: Price paths with shape (n_paths, n_days).
+    """
+    rng = np.random.default_rng(seed_sequence)
+    n_history = len(daily_returns)
+    n_steps = n_days - 1 # The first day of every path has no return
+
+    if method == 'block':
+        # Concatenate randomly placed blocks of block_size consecutive days
+        n_blocks = -(-n_steps // block_size)
+        starts = rng.integers(0, n_history - block_size + 1, size=(n_paths, n_blocks))
+        sample_idx = (starts[:, :, None] + np.arange(block_size)).reshape(n_paths, -1)[:, :n_steps]
+
+    else:
+        # Each day starts a new block with probability 1 / block_size; otherwise continue the previous block (wrapping around)
+        steps = np.arange(n_steps)
+        new_block = rng.random((n_paths, n_steps)) < 1 / block_size
+        new_block[:, 0] = True
+        block_start = np.maximum.accumulate(np.where(new_block, steps, 0), axis=1)
+        starts = rng.integers(0, n_history, size=(n_paths, n_steps))
+        sample_idx = (np.take_along_axis(starts, block_start, axis=1) + steps - block_start) % n_history
+
+    paths = np.empty((n_paths, n_days))
+    paths[:, 0] = 1
+    paths[:, 1:] = 1 + daily_returns[sample_idx] * leverage_scalar
+    return np.cumprod(paths, axis=1) * start_price
+
+
+def _bootstrap_inputs(data, price_column, n_days):
+    """Historical daily returns, start price and path length used by bootstrap_paths()."""
+    prices = data[price_column].ffill().to_numpy(dtype='float64')
+    daily_returns = prices[1:] / prices[:-1] - 1
+    daily_returns = daily_returns[~np.isnan(daily_returns)]
+    return daily_returns, prices[~np.isnan(prices)][0], n_days or len(prices)
+
+
+def _bootstrap_chunk_sizes(n_paths, chunk_size, seed):
+    """Split n_paths into chunks, each with its own child seed so results do not depend on which worker runs a chunk."""
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    return sizes, np.random.SeedSequence(seed).spawn(len(sizes))
+
+
+#########################################################################################################################################################
+def bootstrap_paths(data, n_paths, n_days=None, price_column='Adj Close', leverage_scalar=1, block_size=20, method='stationary', seed=None, chunk_size=500):
+    """
+    Generate synthetic price paths by resampling the daily returns of a price column with a stationary or moving block bootstrap.
+    Paths are yielded in chunks so large runs (e.g., 10,000 paths x 30 years) never materialize all at once.
+
+    Parameters:
+        data (pd.DataFrame): Output of process_leveraged_data() or leverage_dataframe() (or any DataFrame with a price column).
+        n_paths (int): Total number of paths to generate.
+        n_days (int or None): Number of days per path. Default is the length of data.
+        price_column (str): The column whose daily returns are resampled. Default is 'Adj Close'.
+        leverage_scalar (float): Scalar applied to every resampled daily return. Default is 1 (use 3 to lever an unleveraged column).
+        block_size (int): Block length ('block') or mean block length ('stationary'). Default is 20 days.
+        method (str): 'stationary' (default) or 'block'.
+        seed (int or None): Seed for reproducible runs.
+        chunk_size (int): Number of paths yielded at a time.
+
+    Yields:
+        np.ndarray: Price paths with shape (paths in chunk, n_days).
+    """
+    if method not in ['stationary', 'block']:
+        raise ValueError("Invalid method. Use 'stationary' or 'block'.")
+
+    daily_returns, start_price, n_days = _bootstrap_inputs(data, price_column, n_days)
+    sizes, seeds = _bootstrap_chunk_sizes(n_paths, chunk_size, seed)
+    for size, seed_sequence in zip(sizes, seeds):
+        yield _bootstrap_chunk(daily_returns, start_price, size, n_days, leverage_scalar, block_size, method, seed_sequence)
+
+
+def _bootstrap_chunk_stats(task):
+    """Worker: generate one chunk of bootstrapped paths and reduce it to per-path high/non-high statistics."""
+    daily_returns, start_price, size, n_days, leverage_scalar, block_size, method, seed_sequence, high_type, window, holding_periods, lookback = task
+    paths = _bootstrap_chunk(daily_returns, start_price, size, n_days, leverage_scalar, block_size, method, seed_sequence)
+    return pd.DataFrame(_high_return_stats(paths.T, high_type, window, holding_periods, lookback))
+
+
+#########################################################################################################################################################
+def bootstrap_ath_analysis(data, n_paths, n_days=None, price_column='Adj Close', leverage_scalar=1, high_type="ATH", window=0,
+                           holding_periods=DEFAULT_HOLDING_PERIODS,
+                           block_size=20, method='stationary', seed=None, chunk_size=500, max_workers=None):
+    """
+    Run the high detection and forward-return analysis over bootstrapped price paths to get a distribution across paths
+    instead of relying on the single historical path.
+
+    Parameters:
+        data (pd.DataFrame): Output of process_leveraged_data() or leverage_dataframe() (or any DataFrame with a price column).
+        n_paths (int): Total number of paths to generate.
+        n_days (int or None): Number of days per path. Default is the length of data.
+        price_column (str): The column whose daily returns are resampled. Default is 'Adj Close'.
+        leverage_scalar (float): Scalar applied to every resampled daily return. Default is 1.
+        high_type (str): Type of high to analyze, either 'ATH' (All-Time High) or '52W' (52-week high). Default is 'ATH'.
+        window (int): Number of rows (days for daily data, months for monthly data) to expand each high by (± window). Default is 0.
+        holding_periods (dict): A dictionary where keys are holding period labels (e.g., 'Return_3M') and values are the number of days in the holding period (e.g., 91 for 3 months).
+                                For non-daily data (e.g., monthly data from load_shiller_data) the days are converted to rows, and the 52W lookback follows the data's frequency.
+        block_size (int): Block length ('block') or mean block length ('stationary'). Default is 20 days.
+        method (str): 'stationary' (default) or 'block'.
+        seed (int or None): Seed for reproducible runs. For a given seed and chunk_size, results are identical with any number of workers.
+        chunk_size (int): Number of paths generated (and held in memory) at a time per worker.
+        max_workers (int or None): Number of worker processes. Default (None) runs serially in this process.
+
+    Returns:
+        pd.DataFrame: One row per path with high/non-high counts and median forward returns per holding period.
+    """
+    if method not in ['stationary', 'block']:
+        raise ValueError("Invalid method. Use 'stationary' or 'block'.")
+
+    lookback = _periods_per_year(data)
+    holding_periods = scale_holding_periods(holding_periods, lookback) # Day counts -> rows for non-daily data
+    daily_returns, start_price, n_days = _bootstrap_inputs(data, price_column, n_days)
+    sizes, seeds = _bootstrap_chunk_sizes(n_paths, chunk_size, seed)
+    tasks = [(daily_returns, start_price, size, n_days, leverage_scalar, block_size, method, seed_sequence, high_type, window, holding_periods, lookback)
+             for size, seed_sequence in zip(sizes, seeds)]
+
+    if max_workers is None:
+        results = [_bootstrap_chunk_stats(task) for task in tasks]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=max_workers) as pool:
+            results = list(pool.map(_bootstrap_chunk_stats, tasks))
+
+    results = pd.concat(results, ignore_index=True)
+    results.insert(0, 'Path', np.arange(len(results)))
+    return results
+
+
+#########################################################################################################################################################
+class ATHTracker:
+    """
+    Incremental version of leverage_dataframe() + find_ath_indices() + the return calculators for daily refreshes.
+    Appending N new bars updates the leveraged price, the ATH and 52-week high flags, and every forward return that
+    matured in O(N) instead of reprocessing the whole history. The state can be saved to and restored from a JSON file.
+
+    Parameters:
+        leverage_scalar (float): The leverage scalar to apply. Default is 1.
+        holding_periods (dict): A dictionary where keys are holding period labels (e.g., 'Return_3M') and values are the number of rows (days for daily bars) in the holding period.
+        lookback (int): Number of trailing rows in the 52-week window. Default is DAYS_PER_YEAR (daily bars).
+    """
+
+    def __init__(self, leverage_scalar=1, holding_periods=DEFAULT_HOLDING_PERIODS, lookback=DAYS_PER_YEAR):
+        self.leverage_scalar = leverage_scalar
+        self.holding_periods = dict(holding_periods)
+        self.lookback = lookback
+        self.rows = 0                      # Number of bars seen so far
+        self.last_adj_close = None
+        self.last_leveraged_price = None
+        self.current_ath = -9999           # Same starting point as find_ath_indices()
+        self.window_max = deque()          # Monotonic deque of (row, price) covering the trailing 52 weeks
+        self.pending = deque(maxlen=max(self.holding_periods.values())) # (date, price, is ATH, is 52W high) awaiting maturity
+
+    def __repr__(self):
+        return f"ATHTracker(leverage_scalar={self.leverage_scalar}, rows={self.rows}, current_ath={self.current_ath})"
+
+    @classmethod
+    def from_history(cls, data, leverage_scalar=1, holding_periods=DEFAULT_HOLDING_PERIODS):
+        """
+        Build a tracker from an existing DataFrame with 'Date' and 'Adj Close' columns. Holding periods are given in days and, like the
+        52W lookback, follow the data's frequency (e.g., monthly data from load_shiller_data).
+        """
+        periods_per_year = _periods_per_year(data)
+        tracker = cls(leverage_scalar, scale_holding_periods(holding_periods, periods_per_year), lookback=periods_per_year)
+        tracker.update(data['Date'], data['Adj Close'])
+        return tracker
+
+    def update(self, dates, adj_close):
+        """
+        Append new daily bars.
+
+        Parameters:
+            dates (array-like): Dates of the new bars, oldest first.
+            adj_close (array-like): Adjusted close prices of the new bars (NaNs are forward filled).
+
+        Returns:
+            tuple: (pd.DataFrame of the new bars with 'Date', 'Adj Close', 'Leveraged Price', 'ATH' and '52W' columns,
+                    pd.DataFrame of the forward returns that matured with 'Date', 'Holding Period', 'Return', 'ATH' and '52W' columns).
+        """
+        bars, matured = [], []
+        for date, price in zip(dates, np.asarray(adj_close, dtype='float64')):
+            if np.isnan(price) and self.last_adj_close is not None: # Forward fill, like leverage_dataframe()
+                price = self.last_adj_close
+
+            # Simulate the leveraged price from the previous bar
+            if self.last_leveraged_price is None:
+                leveraged_price = price
+            else:
+                leveraged_price = self.last_leveraged_price * (1 + (price / self.last_adj_close - 1) * self.leverage_scalar)
+
+            # New ATH: strictly above every previous price
+            is_ath = leveraged_price > self.current_ath
+            if is_ath:
+                self.current_ath = leveraged_price
+
+            # 52W high: at or above the max of the trailing lookback rows (drop rows that left the window, then compare)
+            while self.window_max and self.window_max[0][0] < self.rows - self.lookback:
+                self.window_max.popleft()
+            is_52w = not self.window_max or leveraged_price >= self.window_max[0][1]
+            while self.window_max and self.window_max[-1][1] <= leveraged_price:
+                self.window_max.pop()
+            self.window_max.append((self.rows, leveraged_price))
+
+            # Forward returns whose holding period ends on this bar
+            for period_name, holding_period in self.holding_periods.items():
+                if holding_period <= len(self.pending):
+                    entry_date, entry_price, entry_ath, entry_52w = self.pending[-holding_period]
+                    matured.append({'Date': entry_date, 'Holding Period': period_name, 'Return': (leveraged_price - entry_price) / entry_price,
+                                    'ATH': entry_ath, '52W': entry_52w})
+
+            self.pending.append((date, leveraged_price, bool(is_ath), bool(is_52w)))
+            bars.append({'Date': date, 'Adj Close': price, 'Leveraged Price': leveraged_price, 'ATH': bool(is_ath), '52W': bool(is_52w)})
+            self.last_adj_close = price
+            self.last_leveraged_price = leveraged_price
+            self.rows += 1
+
+        return (pd.DataFrame(bars, columns=['Date', 'Adj Close', 'Leveraged Price', 'ATH', '52W']),
+                pd.DataFrame(matured, columns=['Date', 'Holding Period', 'Return', 'ATH', '52W']))
+
+    def to_dict(self):
+        """Serializable snapshot of the tracker state."""
+        return {
+            'leverage_scalar': self.leverage_scalar,
+            'holding_periods': self.holding_periods,
+            'lookback': self.lookback,
+            'rows': self.rows,
+            'last_adj_close': self.last_adj_close,
+            'last_leveraged_price': self.last_leveraged_price,
+            'current_ath': self.current_ath,
+            'window_max': [list(item) for item in self.window_max],
+            'pending': [[pd.Timestamp(date).isoformat(), price, is_ath, is_52w] for date, price, is_ath, is_52w in self.pending],
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """Restore a tracker from to_dict() output."""
+        tracker = cls(state['leverage_scalar'], state['holding_periods'], state['lookback'])
+        tracker.rows = state['rows']
+        tracker.last_adj_close = state['last_adj_close']
+        tracker.last_leveraged_price = state['last_leveraged_price']
+        tracker.current_ath = state['current_ath']
+        tracker.window_max = deque(tuple(item) for item in state['window_max'])
+        tracker.pending.extend((pd.Timestamp(date), price, is_ath, is_52w) for date, price, is_ath, is_52w in state['pending'])
+        return tracker
+
+    def save(self, path):
+        """Write the tracker state to a JSON file."""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+
+    @classmethod
+    def load(cls, path):
+        """Read a tracker state written by save()."""
+        with open(path) as f:
+            return cls.from_dict(json.load(f))